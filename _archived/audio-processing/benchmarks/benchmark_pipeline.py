@@ -0,0 +1,324 @@
+import os
+import sys
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from audio_processor import (
+    AudioProcessingConfig,
+    AudioProcessor,
+    PCMBuffer,
+    create_spectrogram,
+    scan_waveform,
+    detect_bpm,
+    detect_key,
+    measure_loudness
+)
+
+# Default fixture matrix: (signal, seconds, sample rate, channels)
+DEFAULT_FIXTURES = [
+    ("sweep", 30, 44100, 2),
+    ("noise", 30, 48000, 1),
+    ("sweep", 180, 44100, 2),
+    ("noise", 180, 96000, 2),
+    ("sweep", 600, 48000, 2),
+]
+
+class StubS3Client:
+    """Local-directory stand-in for the boto3 S3 calls AudioProcessor makes"""
+    
+    def __init__(self, root: str):
+        self.root = Path(root)
+    
+    def _path(self, bucket: str, key: str) -> Path:
+        """Local file backing bucket/key"""
+        path = self.root / bucket / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    def download_file(self, bucket: str, key: str, filename: str, Config=None):
+        """Copy an object to a local file"""
+        shutil.copyfile(self._path(bucket, key), filename)
+    
+    def upload_file(self, filename: str, bucket: str, key: str, Config=None):
+        """Copy a local file to an object"""
+        shutil.copyfile(filename, self._path(bucket, key))
+    
+    def copy(self, source: Dict[str, str], bucket: str, key: str, Config=None):
+        """Server-side copy between objects"""
+        shutil.copyfile(self._path(source['Bucket'], source['Key']), self._path(bucket, key))
+    
+    def get_object(self, Bucket: str, Key: str) -> Dict:
+        """Object with a readable Body stream"""
+        return {'Body': open(self._path(Bucket, Key), 'rb')}
+
+class StubMetadataStore:
+    """In-memory stand-in for the MetadataStore calls AudioProcessor makes"""
+    
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+    
+    def update_status(self, file_id: str, status: str, **fields):
+        """Record a status update"""
+        self.data.setdefault(f"processing_status:{file_id}", {}).update(status=status, **fields)
+    
+    async def set_status(self, file_id: str, status: str, error: Optional[str] = None, **fields):
+        """Record a status update"""
+        self.update_status(file_id, status, error=error, **fields)
+    
+    async def set_metadata(self, file_id: str, metadata: Dict[str, Any]):
+        """Record metadata fields"""
+        self.data.setdefault(f"audio_metadata:{file_id}", {}).update(metadata)
+    
+    async def get_record(self, key: str) -> Any:
+        """Value of a key"""
+        return self.data.get(key)
+    
+    async def set_record(self, key: str, record: Any, ttl: int):
+        """Set a key; expiry is ignored"""
+        self.data[key] = record
+    
+    async def delete(self, *keys: str):
+        """Remove keys"""
+        for key in keys:
+            self.data.pop(key, None)
+    
+    async def incr(self, key: str) -> int:
+        """Increment a counter"""
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+    
+    async def get_counters(self, *keys: str) -> Dict[str, int]:
+        """Values of several counters"""
+        return {key: self.data.get(key, 0) for key in keys}
+
+def synthesize(signal: str, seconds: float, sample_rate: int, channels: int, seed: int = 0) -> np.ndarray:
+    """Deterministic (frames, channels) float32 test signal at -6 dBFS peak"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    
+    if signal == "sweep":
+        # Logarithmic sweep 20 Hz to 20 kHz (capped below Nyquist), channels offset in phase
+        high = min(20000.0, sample_rate * 0.45)
+        rate = np.log(high / 20.0) / seconds
+        phase = 2 * np.pi * 20.0 * (np.exp(rate * t) - 1) / rate
+        audio = np.stack([np.sin(phase + channel * np.pi / 4) for channel in range(channels)], axis=1)
+    elif signal == "noise":
+        rng = np.random.default_rng(seed)
+        audio = rng.uniform(-1.0, 1.0, (len(t), channels))
+    else:
+        raise ValueError(f"Unknown signal: {signal}")
+    
+    return (audio * 0.5).astype(np.float32)
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int):
+    """Write 16-bit PCM WAV"""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(audio.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+def has_output(result: Any) -> bool:
+    """Whether a stage produced something; stages that swallow errors return None or empty results"""
+    if isinstance(result, tuple):
+        return all(has_output(item) for item in result)
+    return result is not None and not (hasattr(result, "__len__") and len(result) == 0)
+
+def time_call(func: Callable, repeat: int, stage: str) -> float:
+    """Median wall time of repeat calls, failing if any call produced no output"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+        if not has_output(result):
+            raise RuntimeError(f"{stage} produced no output")
+    return statistics.median(timings)
+
+def stage_result(seconds: float, audio_seconds: float, input_bytes: int) -> Dict[str, float]:
+    """Timing with realtime factor and throughput"""
+    return {
+        "seconds": seconds,
+        "realtime_factor": audio_seconds / seconds if seconds > 0 else float("inf"),
+        "mb_per_s": input_bytes / seconds / 1e6 if seconds > 0 else float("inf")
+    }
+
+def make_processor(work_dir: str, analysis_executor: str = "thread") -> AudioProcessor:
+    """AudioProcessor wired to local S3 and metadata store stubs"""
+    config = AudioProcessingConfig(
+        input_bucket="bench-input",
+        output_bucket="bench-output",
+        temp_dir=os.path.join(work_dir, "temp"),
+        dedup_enabled=False,
+        checkpoints_enabled=False,
+        analysis_executor=analysis_executor
+    )
+    processor = AudioProcessor(config)
+    processor.s3_client = StubS3Client(os.path.join(work_dir, "s3"))
+    processor.metadata_store = StubMetadataStore()
+    return processor
+
+def benchmark_fixture(fixture: Tuple[str, int, int, int], work_dir: str, repeat: int,
+                      analysis_executor: str = "thread") -> Dict[str, Dict[str, float]]:
+    """Time every stage for one synthetic fixture"""
+    signal, seconds, sample_rate, channels = fixture
+    name = f"{signal}_{seconds}s_{sample_rate}hz_{channels}ch"
+    
+    audio = synthesize(signal, seconds, sample_rate, channels)
+    wav_path = os.path.join(work_dir, f"{name}.wav")
+    write_wav(wav_path, audio, sample_rate)
+    wav_bytes = os.path.getsize(wav_path)
+    
+    processor = make_processor(work_dir, analysis_executor)
+    loop = asyncio.new_event_loop()
+    run = loop.run_until_complete
+    results = {}
+    
+    def measure(stage: str, func: Callable, input_bytes: int):
+        """Time one stage and record it"""
+        results[stage] = stage_result(time_call(func, repeat, stage), seconds, input_bytes)
+    
+    try:
+        # Metadata extraction and decode feed the in-memory stages
+        measure("extract_metadata", lambda: run(processor._extract_metadata(wav_path, name)), wav_bytes)
+        metadata = run(processor._extract_metadata(wav_path, name))
+        
+        measure("decode_pcm", lambda: run(processor._decode_pcm(wav_path, name, metadata)), wav_bytes)
+        pcm = run(processor._decode_pcm(wav_path, name, metadata))
+        pcm_bytes = os.path.getsize(pcm.path)
+        mono = np.ascontiguousarray(pcm.mono())
+        
+        # The single PCM pass behind the waveform image and every zoom level's peaks
+        measure("scan_waveform", lambda: scan_waveform(pcm, processor.config.waveform_zoom_levels), pcm_bytes)
+        measure("create_spectrogram", lambda: create_spectrogram(mono), pcm_bytes)
+        measure("loudness", lambda: measure_loudness(pcm), pcm_bytes)
+        
+        # Tempo and key share a cached decimation; time them on a fresh buffer each run
+        def tempo_and_key():
+            buffer = PCMBuffer(pcm.path, pcm.sample_rate, pcm.channels)
+            return detect_bpm(buffer), detect_key(buffer)
+        
+        measure("bpm_and_key", tempo_and_key, pcm_bytes)
+        
+        # Watermark embedding streamed into the FLAC encoder
+        measure("watermark", lambda: run(processor._add_watermark(pcm, name)), pcm_bytes)
+        
+        # Transcodes, one ffmpeg process per format and the single-pass fan-out
+        transcode_dir = os.path.join(work_dir, "transcode")
+        os.makedirs(transcode_dir, exist_ok=True)
+        
+        def transcode(convert: Callable, output_name: str, *args) -> List[str]:
+            """Run one converter, returning its output when ffmpeg wrote any"""
+            output_path = os.path.join(transcode_dir, output_name)
+            run(convert(wav_path, output_path, *args))
+            return [output_path] if os.path.getsize(output_path) else []
+        
+        measure("transcode_flac", lambda: transcode(processor._convert_to_flac, "out_flac"), wav_bytes)
+        measure("transcode_mp3_320", lambda: transcode(processor._convert_to_mp3, "out_mp3", "320k"), wav_bytes)
+        measure("transcode_all", lambda: run(processor._process_formats(wav_path, name, metadata)), wav_bytes)
+        
+        # End to end through the stubbed S3 and Redis
+        s3_key = f"uploads/{name}.wav"
+        shutil.copyfile(wav_path, processor.s3_client._path(processor.config.input_bucket, s3_key))
+        measure("end_to_end", lambda: run(processor.process_audio_file(name, s3_key)), wav_bytes)
+        
+        pcm.close()
+    finally:
+        loop.close()
+        processor.executor.shutdown()
+        if processor.analysis_executor is not processor.executor:
+            processor.analysis_executor.shutdown()
+    
+    return {f"{name}/{stage}": result for stage, result in results.items()}
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Stages slower than the baseline by more than threshold"""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        previous = baseline[key]["seconds"]
+        if result["seconds"] > previous * (1 + threshold):
+            regressions.append(f"{key}: {result['seconds']:.3f}s vs baseline {previous:.3f}s "
+                               f"(+{(result['seconds'] / previous - 1) * 100:.0f}%)")
+    return regressions
+
+def parse_fixtures(args) -> List[Tuple[str, int, int, int]]:
+    """Fixture matrix from the command line, or the defaults"""
+    if not (args.signals or args.durations or args.sample_rates or args.channels):
+        return DEFAULT_FIXTURES
+    return [
+        (signal, duration, sample_rate, channels)
+        for signal in (args.signals or ["sweep", "noise"])
+        for duration in (args.durations or [30])
+        for sample_rate in (args.sample_rates or [44100])
+        for channels in (args.channels or [2])
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark AudioProcessor stages on synthetic audio with stubbed S3 and Redis. "
+                    "Requires ffmpeg/ffprobe on PATH."
+    )
+    parser.add_argument("--signals", nargs="+", choices=["sweep", "noise"])
+    parser.add_argument("--durations", nargs="+", type=int, help="fixture lengths in seconds")
+    parser.add_argument("--sample-rates", nargs="+", type=int)
+    parser.add_argument("--channels", nargs="+", type=int)
+    parser.add_argument("--analysis-executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the median is reported")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="write results as a new baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before failing")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("audio_processor").setLevel(logging.WARNING)
+    
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="audio-bench-") as work_dir:
+        for fixture in parse_fixtures(args):
+            fixture_results = benchmark_fixture(fixture, work_dir, args.repeat, args.analysis_executor)
+            for key, result in fixture_results.items():
+                print(f"{key:<55} {result['seconds']:>9.3f}s {result['realtime_factor']:>9.1f}x "
+                      f"{result['mb_per_s']:>9.1f} MB/s")
+            results.update(fixture_results)
+    
+    report = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "analysis_executor": args.analysis_executor,
+        "results": results
+    }
+    
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo stage slower than baseline by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
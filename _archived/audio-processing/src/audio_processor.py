@@ -1,20 +1,29 @@
 import os
 import asyncio
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 import boto3
-import redis
-from pydantic import BaseModel
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from pydantic import BaseModel, SecretStr
 import ffmpeg
 import numpy as np
+from scipy import signal
 from PIL import Image
 import io
 import json
 import hashlib
+import functools
+import struct
+import contextlib
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import aiofiles
+from metadata_store import MetadataStore
+from prometheus_client import Histogram
 import aiohttp
 
 # Configure logging
@@ -30,10 +39,47 @@ class AudioProcessingConfig(BaseModel):
     supported_formats: List[str] = ["flac", "mp3", "wav", "aiff"]
     output_formats: List[str] = ["flac", "mp3_320", "mp3_128"]
     watermark_enabled: bool = True
+    watermark_key: SecretStr = SecretStr("")  # secret mixed into each file's watermark seed
+    watermark_strength_db: float = -36.0  # watermark level relative to each block's RMS
+    watermark_threshold: float = 6.0  # detection score above which a file counts as marked
     waveform_enabled: bool = True
     spectrogram_enabled: bool = True
+    spectrogram_mode: str = "full"  # "full" or "streaming" for bounded memory on long recordings
+    spectrogram_pooling: str = "mean"  # "mean" or "max" column pooling in streaming mode
+    waveform_zoom_levels: List[int] = [256, 512, 4096]
+    waveform_peak_formats: List[str] = ["dat", "json"]
+    waveform_peak_bits: int = 8
     redis_url: str = "redis://localhost:6379"
+    s3_endpoint_url: Optional[str] = None  # e.g. a local MinIO or moto server
+    s3_multipart_threshold_mb: int = 16
+    s3_multipart_chunksize_mb: int = 16
+    s3_max_concurrency: int = 10  # threads per transfer
+    s3_max_concurrent_transfers: int = 8
     max_workers: int = 4
+    analysis_executor: str = "thread"  # "thread" or "process" to spread analysis stages over all cores
+    analysis_workers: Optional[int] = None  # process pool size, defaults to the CPU count
+    max_concurrent_transcodes: int = 4
+    single_pass_transcode: bool = True
+    streaming_ingest: bool = False  # pipe the S3 body into ffmpeg instead of downloading first; dedup runs after the ingest
+    stream_chunk_size_kb: int = 1024
+    stream_probe_size_kb: int = 1024
+    # Reuse outputs of byte-identical masters. With watermarking on, a hit still decodes the master and
+    # re-encodes the watermarked FLAC under the new file_id (seeds are per file_id), the costliest stage;
+    # only transcodes, analysis and visualisations are saved. Streaming ingest embeds from the ingested PCM
+    dedup_enabled: bool = True
+    dedup_ttl_seconds: int = 30 * 24 * 3600
+    checkpoints_enabled: bool = True  # retried jobs skip stages whose outputs are already uploaded; keyed on the ETag when streaming
+    checkpoint_ttl_seconds: int = 7 * 24 * 3600
+
+# ffmpeg output options per output format (paths have no extension, so the muxer is explicit)
+OUTPUT_FORMAT_ARGS = {
+    "flac": {"format": "flac", "acodec": "flac", "compression_level": 8},
+    "mp3_320": {"format": "mp3", "acodec": "mp3", "ab": "320k", "q": 0},
+    "mp3_128": {"format": "mp3", "acodec": "mp3", "ab": "128k", "q": 0},
+}
+
+# Metadata fields filled in by the analysis stage, restored from its checkpoint on resume
+ANALYSIS_FIELDS = ("loudness", "loudness_range", "true_peak", "bpm", "key")
 
 class AudioMetadata(BaseModel):
     """Audio file metadata"""
@@ -47,22 +93,728 @@ class AudioMetadata(BaseModel):
     file_size: int
     bitrate: Optional[int] = None
     loudness: Optional[float] = None
+    loudness_range: Optional[float] = None
+    true_peak: Optional[float] = None
     bpm: Optional[float] = None
     key: Optional[str] = None
     genre: Optional[str] = None
     tags: Dict[str, str] = {}
     processing_status: str = "pending"
+    content_hash: Optional[str] = None
     created_at: float = time.time()
 
+# Per-stage wall time, labelled by pipeline stage. CPU, memory and I/O are not broken down by stage:
+# concurrent stages and jobs share this process, so process-wide counters cannot be split between them
+STAGE_TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_WALL_SECONDS = Histogram(
+    'audio_processing_stage_wall_seconds', 'Wall-clock time per pipeline stage',
+    ['stage'], buckets=STAGE_TIME_BUCKETS
+)
+
+# Samples per chunk for streaming reductions over decoded PCM
+WAVEFORM_CHUNK_SAMPLES = 1 << 20
+
+# Read size for streaming content hashes
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def rekey(s3_key: str, source_id: str, target_id: str) -> str:
+    """Rewrite an output key built for one file_id so it belongs to another"""
+    parts = [target_id if part == source_id else part for part in s3_key.split('/')]
+    if parts[-1].startswith(source_id):
+        parts[-1] = target_id + parts[-1][len(source_id):]
+    return '/'.join(parts)
+
+def iter_chunks(samples: np.ndarray, chunk_size: int):
+    """Yield consecutive fixed-size slices of a (possibly memory-mapped) sample array"""
+    for start in range(0, len(samples), chunk_size):
+        yield samples[start:start + chunk_size]
+
+class PeakAccumulator:
+    """Streaming per-bin min/max/RMS over consecutive bins of samples_per_bin samples"""
+    
+    def __init__(self, total_samples: int, samples_per_bin: int):
+        self.samples_per_bin = max(1, samples_per_bin)
+        self.total_samples = total_samples
+        self.position = 0
+        
+        bins = -(-total_samples // self.samples_per_bin)
+        self.mins = np.full(bins, np.inf, dtype=np.float32)
+        self.maxs = np.full(bins, -np.inf, dtype=np.float32)
+        self.sum_squares = np.zeros(bins, dtype=np.float64)
+        self.counts = np.zeros(bins, dtype=np.int64)
+    
+    def update(self, chunk: np.ndarray):
+        """Fold the next chunk of samples into the per-bin statistics"""
+        chunk = chunk[:self.total_samples - self.position]
+        
+        # Complete the bin left open by the previous chunk
+        head = min(len(chunk), -self.position % self.samples_per_bin)
+        if head:
+            self._fold_partial(chunk[:head])
+        
+        # Reduce every whole bin in one reshape
+        body = chunk[head:]
+        full_bins = len(body) // self.samples_per_bin
+        if full_bins:
+            first = self.position // self.samples_per_bin
+            bins = slice(first, first + full_bins)
+            blocks = body[:full_bins * self.samples_per_bin].reshape(full_bins, self.samples_per_bin)
+            self.mins[bins] = blocks.min(axis=1)
+            self.maxs[bins] = blocks.max(axis=1)
+            self.sum_squares[bins] = np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64)
+            self.counts[bins] = self.samples_per_bin
+            self.position += full_bins * self.samples_per_bin
+        
+        # Start the next open bin with whatever is left
+        tail = body[full_bins * self.samples_per_bin:]
+        if len(tail):
+            self._fold_partial(tail)
+    
+    def _fold_partial(self, samples: np.ndarray):
+        """Fold samples that all fall into the current bin"""
+        index = self.position // self.samples_per_bin
+        self.mins[index] = min(self.mins[index], samples.min())
+        self.maxs[index] = max(self.maxs[index], samples.max())
+        self.sum_squares[index] += np.dot(samples.astype(np.float64), samples)
+        self.counts[index] += len(samples)
+        self.position += len(samples)
+    
+    @property
+    def rms(self) -> np.ndarray:
+        """Root mean square per bin"""
+        return np.sqrt(self.sum_squares / np.maximum(self.counts, 1))
+
+def quantize_peaks(peaks: PeakAccumulator, bits: int = 8) -> np.ndarray:
+    """Interleave per-bin min/max as audiowaveform-style 8 or 16 bit integers"""
+    pairs = np.empty(2 * len(peaks.mins), dtype=np.float32)
+    pairs[0::2] = peaks.mins
+    pairs[1::2] = peaks.maxs
+    
+    # Same scaling as audiowaveform: 16-bit samples, shifted down for 8-bit output
+    values = np.clip(np.floor(pairs * 32768.0), -32768, 32767).astype(np.int16)
+    if bits == 8:
+        return (values >> 8).astype(np.int8)
+    return values
+
+def encode_peaks_dat(peaks: PeakAccumulator, sample_rate: int, bits: int = 8) -> bytes:
+    """Encode mono peaks in the audiowaveform binary .dat format (version 2)"""
+    data = quantize_peaks(peaks, bits)
+    flags = 1 if bits == 8 else 0
+    header = struct.pack('<iIiiIi', 2, flags, sample_rate, peaks.samples_per_bin, len(peaks.mins), 1)
+    return header + data.astype('<i2' if bits == 16 else np.int8).tobytes()
+
+def encode_peaks_json(peaks: PeakAccumulator, sample_rate: int, bits: int = 8) -> str:
+    """Encode mono peaks in the audiowaveform JSON format (version 2)"""
+    return json.dumps({
+        "version": 2,
+        "channels": 1,
+        "sample_rate": sample_rate,
+        "samples_per_pixel": peaks.samples_per_bin,
+        "bits": bits,
+        "length": len(peaks.mins),
+        "data": quantize_peaks(peaks, bits).tolist()
+    }, separators=(',', ':'))
+
+# STFT geometry for spectrogram rendering
+SPECTROGRAM_FFT_SIZE = 1024
+SPECTROGRAM_HOP_SIZE = SPECTROGRAM_FFT_SIZE // 4
+SPECTROGRAM_BLOCK_FRAMES = 4096
+
+def stft_magnitude(samples: np.ndarray, fft_size: int, hop_size: int, window: np.ndarray) -> np.ndarray:
+    """Magnitude STFT of every complete frame using a strided frame view and one batched rfft"""
+    if len(samples) < fft_size:
+        return np.zeros((0, fft_size // 2 + 1), dtype=np.float32)
+    
+    frames = np.lib.stride_tricks.sliding_window_view(samples, fft_size)[::hop_size]
+    spectrum = np.fft.rfft(frames * window, axis=1)
+    return np.abs(spectrum).astype(np.float32)
+
+def resample_linear(values: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """Linearly resample one axis of a 2-D array to size points with aligned endpoints"""
+    length = values.shape[axis]
+    positions = np.linspace(0, length - 1, size, dtype=np.float32)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, length - 1)
+    
+    shape = [1, 1]
+    shape[axis] = size
+    weight = (positions - lower).reshape(shape)
+    
+    below = np.take(values, lower, axis=axis)
+    above = np.take(values, upper, axis=axis)
+    return below + (above - below) * weight
+
+# EBU R128 / ITU-R BS.1770-4 gating
+LOUDNESS_SEGMENT_SECONDS = 0.1
+MOMENTARY_SEGMENTS = 4  # 400 ms blocks, 75% overlap
+SHORT_TERM_SEGMENTS = 30  # 3 s blocks for loudness range
+ABSOLUTE_GATE_LUFS = -70.0
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_TAPS = 48
+TRUE_PEAK_BLOCK_FRAMES = 4096
+
+def k_weighting_sos(sample_rate: int) -> np.ndarray:
+    """BS.1770 pre-filter and RLB high-pass as second-order sections for any sample rate"""
+    # High shelf (head effects)
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+        1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0
+    ]
+    
+    # Revised low-frequency B-curve high-pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    
+    return np.array([shelf, highpass])
+
+def channel_weights(channels: int) -> np.ndarray:
+    """BS.1770 channel gains, assuming L R C LFE Ls Rs ordering for 5.1 and up"""
+    weights = np.ones(channels)
+    if channels >= 6:
+        weights[3] = 0.0
+        weights[4:6] = 1.41
+    return weights
+
+def gated_loudness(energies: np.ndarray, relative_gate: float) -> Optional[float]:
+    """Mean loudness of block energies passing the absolute and relative gates"""
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(energies)
+    
+    gated = energies[loudness > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return None
+    
+    threshold = -0.691 + 10 * np.log10(gated.mean()) + relative_gate
+    gated = energies[loudness > max(threshold, ABSOLUTE_GATE_LUFS)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+class LoudnessMeter:
+    """Streaming EBU R128 integrated loudness, loudness range and true peak over interleaved frames"""
+    
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.segment = int(round(sample_rate * LOUDNESS_SEGMENT_SECONDS))
+        self.weights = channel_weights(channels)
+        
+        # K-weighting state carried across chunks, one filter per channel
+        self.sos = k_weighting_sos(sample_rate)
+        self.zi = np.zeros((self.sos.shape[0], 2, channels))
+        
+        # Weighted mean square of every complete 100 ms segment
+        self.pending = np.zeros(0)
+        self.segments: List[np.ndarray] = []
+        
+        # 4x interpolator as polyphase matrix: window of input samples (oldest first) -> 4 outputs
+        interpolator = signal.firwin(TRUE_PEAK_TAPS, 1 / TRUE_PEAK_OVERSAMPLING) * TRUE_PEAK_OVERSAMPLING
+        self.phases = interpolator.reshape(-1, TRUE_PEAK_OVERSAMPLING)[::-1]
+        self.phase_gain = np.abs(self.phases).sum(axis=0).max()
+        self.carry = np.zeros((len(self.phases) - 1, channels))
+        self.peak = 0.0
+    
+    def update(self, frames: np.ndarray):
+        """Fold the next (frames, channels) block into the meter"""
+        if not len(frames):
+            return
+        
+        frames = frames.astype(np.float64)
+        
+        # Weighted channel sum of K-weighted power per frame
+        filtered, self.zi = signal.sosfilt(self.sos, frames, axis=0, zi=self.zi)
+        power = np.concatenate([self.pending, (filtered * filtered) @ self.weights])
+        
+        complete = len(power) // self.segment
+        if complete:
+            self.segments.append(power[:complete * self.segment].reshape(complete, self.segment).mean(axis=1))
+        self.pending = power[complete * self.segment:]
+        
+        # Oversampled peak; the carried tail keeps interpolation exact across chunk boundaries
+        padded = np.concatenate([self.carry, frames])
+        self.peak = max(self.peak, float(np.abs(frames).max()))
+        self._update_true_peak(padded)
+        self.carry = padded[-len(self.carry):]
+    
+    def _update_true_peak(self, padded: np.ndarray):
+        """Interpolate only blocks whose worst-case output could still beat the running peak"""
+        # Channel-major copy so each window row is contiguous for the matmul
+        channels = np.ascontiguousarray(padded.T)
+        windows = np.lib.stride_tricks.sliding_window_view(channels, len(self.phases), axis=1)
+        
+        # Bound every block by its input peak (including the filter's look-back) times the filter gain
+        block_count = -(-windows.shape[1] // TRUE_PEAK_BLOCK_FRAMES)
+        magnitude = np.abs(padded).max(axis=1)
+        magnitude = np.pad(magnitude, (0, (block_count + 1) * TRUE_PEAK_BLOCK_FRAMES - len(magnitude)))
+        block_peaks = magnitude.reshape(-1, TRUE_PEAK_BLOCK_FRAMES).max(axis=1)
+        bounds = np.maximum(block_peaks[:-1], block_peaks[1:]) * self.phase_gain
+        
+        # Loudest blocks first so the bound prunes the rest as early as possible
+        for block in np.argsort(bounds)[::-1]:
+            if bounds[block] <= self.peak:
+                break
+            start = block * TRUE_PEAK_BLOCK_FRAMES
+            interpolated = windows[:, start:start + TRUE_PEAK_BLOCK_FRAMES] @ self.phases
+            self.peak = max(self.peak, float(np.abs(interpolated).max()))
+    
+    def _block_energies(self, segments_per_block: int) -> np.ndarray:
+        """Mean energy of every sliding block of whole segments, one segment hop apart"""
+        segments = np.concatenate(self.segments) if self.segments else np.zeros(0)
+        if len(segments) < segments_per_block:
+            return np.zeros(0)
+        return np.lib.stride_tricks.sliding_window_view(segments, segments_per_block).mean(axis=1)
+    
+    @property
+    def integrated(self) -> Optional[float]:
+        """Gated integrated loudness in LUFS, None for silence"""
+        return gated_loudness(self._block_energies(MOMENTARY_SEGMENTS), -10.0)
+    
+    @property
+    def loudness_range(self) -> Optional[float]:
+        """EBU Tech 3342 loudness range in LU over gated 3 s short-term blocks"""
+        energies = self._block_energies(SHORT_TERM_SEGMENTS)
+        with np.errstate(divide='ignore'):
+            loudness = -0.691 + 10 * np.log10(energies)
+        
+        gated = energies[loudness > ABSOLUTE_GATE_LUFS]
+        if not len(gated):
+            return None
+        
+        threshold = -0.691 + 10 * np.log10(gated.mean()) - 20.0
+        short_term = loudness[loudness > max(threshold, ABSOLUTE_GATE_LUFS)]
+        low, high = np.percentile(short_term, [10, 95])
+        return float(high - low)
+    
+    @property
+    def true_peak(self) -> Optional[float]:
+        """Maximum 4x oversampled sample peak in dBTP, None for silence"""
+        if self.peak <= 0:
+            return None
+        return float(20 * np.log10(self.peak))
+
+# Reduced-rate mono shared by tempo and key analysis
+ANALYSIS_SAMPLE_RATE = 11025
+ONSET_FFT_SIZE = 1024
+ONSET_HOP_SIZE = 256
+TEMPO_MIN_BPM = 30.0
+TEMPO_MAX_BPM = 300.0
+TEMPO_PRIOR_BPM = 120.0
+TEMPO_PRIOR_OCTAVES = 1.0
+
+def decimate_mono(samples: np.ndarray, channels: int, factor: int) -> np.ndarray:
+    """Mix interleaved samples to mono and box-filter decimate by factor, one chunk at a time"""
+    step = channels * factor
+    chunk_size = max(step, WAVEFORM_CHUNK_SAMPLES - WAVEFORM_CHUNK_SAMPLES % step)
+    usable = len(samples) - len(samples) % step
+    
+    decimated = np.empty(usable // step, dtype=np.float32)
+    for start in range(0, usable, chunk_size):
+        chunk = samples[start:min(start + chunk_size, usable)]
+        first = start // step
+        decimated[first:first + len(chunk) // step] = chunk.reshape(-1, step).mean(axis=1, dtype=np.float32)
+    
+    return decimated
+
+def onset_strength(samples: np.ndarray, fft_size: int = ONSET_FFT_SIZE, hop_size: int = ONSET_HOP_SIZE) -> np.ndarray:
+    """Half-wave rectified spectral flux of the log-compressed magnitude STFT, one value per frame"""
+    if len(samples) < fft_size:
+        return np.zeros(0, dtype=np.float32)
+    
+    window = np.hanning(fft_size).astype(np.float32)
+    frame_count = 1 + (len(samples) - fft_size) // hop_size
+    envelope = np.zeros(frame_count, dtype=np.float32)
+    previous = None
+    
+    for first in range(0, frame_count, SPECTROGRAM_BLOCK_FRAMES):
+        count = min(SPECTROGRAM_BLOCK_FRAMES, frame_count - first)
+        start = first * hop_size
+        block = samples[start:start + (count - 1) * hop_size + fft_size]
+        magnitudes = np.log1p(100 * stft_magnitude(block, fft_size, hop_size, window))
+        
+        # Carry the last frame so flux is continuous across blocks
+        if previous is not None:
+            magnitudes = np.vstack([previous, magnitudes])
+        flux = np.maximum(np.diff(magnitudes, axis=0), 0).sum(axis=1)
+        envelope[first + (previous is None):first + count] = flux
+        previous = magnitudes[-1:]
+    
+    return envelope
+
+def estimate_tempo(envelope: np.ndarray, frame_rate: float) -> Optional[float]:
+    """Tempo in BPM from the onset envelope autocorrelation weighted by a log-normal tempo prior"""
+    envelope = envelope - envelope.mean()
+    min_lag = int(np.floor(frame_rate * 60 / TEMPO_MAX_BPM))
+    max_lag = int(np.ceil(frame_rate * 60 / TEMPO_MIN_BPM))
+    if len(envelope) <= max_lag or not envelope.any():
+        return None
+    
+    # Autocorrelation through one zero-padded real FFT
+    size = 1 << int(np.ceil(np.log2(2 * len(envelope))))
+    spectrum = np.fft.rfft(envelope, size)
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum), size)
+    
+    lags = np.arange(max(min_lag, 1), max_lag + 1)
+    bpms = 60 * frame_rate / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / TEMPO_PRIOR_BPM) / TEMPO_PRIOR_OCTAVES) ** 2)
+    lag = lags[np.argmax(autocorrelation[lags] * prior)]
+    
+    # Refine on the peak a few beats out, where one frame of error is a fraction of a beat
+    multiple = next((k for k in (4, 2) if (k + 1) * lag + 1 < len(envelope)), 1)
+    candidates = np.arange(multiple * (lag - 1), multiple * (lag + 1) + 1)
+    peak_lag = candidates[np.argmax(autocorrelation[candidates])]
+    
+    # Parabolic interpolation around the peak for sub-frame lag resolution
+    below, peak, above = autocorrelation[peak_lag - 1:peak_lag + 2]
+    curvature = below - 2 * peak + above
+    offset = 0.5 * (below - above) / curvature if curvature < 0 else 0.0
+    
+    return float(60 * frame_rate * multiple / (peak_lag + offset))
+
+# Chroma geometry and Krumhansl-Kessler key profiles
+KEY_FFT_SIZE = 4096
+KEY_MIN_FREQUENCY = 55.0
+KEY_MAX_FREQUENCY = 2000.0
+PITCH_CLASSES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+def chroma_vector(samples: np.ndarray, sample_rate: float, fft_size: int = KEY_FFT_SIZE) -> np.ndarray:
+    """Track-level 12-bin pitch class energy from non-overlapping STFT frames"""
+    if len(samples) < fft_size:
+        return np.zeros(12)
+    
+    # Sum magnitudes over time first; the pitch class mapping is linear
+    window = np.hanning(fft_size).astype(np.float32)
+    frame_count = len(samples) // fft_size
+    spectrum = np.zeros(fft_size // 2 + 1, dtype=np.float64)
+    for first in range(0, frame_count, SPECTROGRAM_BLOCK_FRAMES):
+        block = samples[first * fft_size:min(first + SPECTROGRAM_BLOCK_FRAMES, frame_count) * fft_size]
+        spectrum += stft_magnitude(block, fft_size, fft_size, window).sum(axis=0, dtype=np.float64)
+    
+    # Fold every bin in the musical range onto its nearest pitch class
+    frequencies = np.fft.rfftfreq(fft_size, 1 / sample_rate)
+    in_range = (frequencies >= KEY_MIN_FREQUENCY) & (frequencies <= KEY_MAX_FREQUENCY)
+    pitch_classes = np.round(12 * np.log2(frequencies[in_range] / 440.0) + 69).astype(np.int64) % 12
+    return np.bincount(pitch_classes, weights=spectrum[in_range], minlength=12)
+
+def estimate_key(chroma: np.ndarray) -> Optional[str]:
+    """Best correlating major or minor key for a chroma vector"""
+    if not chroma.any():
+        return None
+    
+    # All 24 rotated profiles against the chroma in one matrix product
+    shifts = (np.arange(12)[None, :] - np.arange(12)[:, None]) % 12
+    profiles = np.vstack([MAJOR_PROFILE[shifts], MINOR_PROFILE[shifts]])
+    profiles = (profiles - profiles.mean(axis=1, keepdims=True)) / profiles.std(axis=1, keepdims=True)
+    chroma = (chroma - chroma.mean()) / (chroma.std() or 1.0)
+    
+    best = int(np.argmax(profiles @ chroma))
+    mode = "major" if best < 12 else "minor"
+    return f"{PITCH_CLASSES[best % 12]} {mode}"
+
+# Watermark blocks are keyed by index, so any block's sequence can be regenerated on its own
+WATERMARK_BLOCK_FRAMES = 16384
+WATERMARK_FLOOR = 1e-4  # blocks quieter than this RMS are left unmarked
+WATERMARK_DETECT_BLOCKS = 64  # blocks correlated per vectorized batch
+
+def watermark_seed(file_id: str, key: str = "") -> int:
+    """64-bit watermark seed for a file, keyed by a secret"""
+    digest = hashlib.blake2b(file_id.encode(), key=key.encode()[:64], digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def watermark_sequence(seed: int, block: int, frames: int = WATERMARK_BLOCK_FRAMES) -> np.ndarray:
+    """Unit-variance pseudo-random sequence for one watermark block"""
+    rng = np.random.default_rng([seed, block])
+    return rng.standard_normal(frames, dtype=np.float32)
+
+def iter_watermarked(pcm: "PCMBuffer", seed: int, strength_db: float,
+                     block_frames: int = WATERMARK_BLOCK_FRAMES) -> Iterator[bytes]:
+    """Interleaved f32le blocks of the PCM with the keyed sequence added at strength_db below the block RMS"""
+    gain = np.float32(10 ** (strength_db / 20))
+    frames = pcm.samples[:pcm.frames * pcm.channels].reshape(-1, pcm.channels)
+    
+    for block, start in enumerate(range(0, pcm.frames, block_frames)):
+        samples = np.array(frames[start:start + block_frames], dtype=np.float32)
+        mono = samples.mean(axis=1, dtype=np.float32)
+        rms = np.sqrt(np.dot(mono, mono) / len(mono))
+        
+        # The same sequence goes into every channel so it survives a mono downmix
+        if rms > WATERMARK_FLOOR:
+            sequence = watermark_sequence(seed, block, block_frames)[:len(samples)]
+            sequence *= gain * rms
+            samples += sequence[:, None]
+            np.clip(samples, -1.0, 1.0, out=samples)
+        
+        yield samples.tobytes()
+
+def detect_watermark(pcm: "PCMBuffer", seed: int, block_frames: int = WATERMARK_BLOCK_FRAMES) -> float:
+    """Watermark score of the PCM for a seed; standard normal for unmarked audio"""
+    scores = []
+    batch_frames = block_frames * WATERMARK_DETECT_BLOCKS
+    
+    for first in range(0, pcm.frames, batch_frames):
+        frames = pcm.samples[first * pcm.channels:(first + batch_frames) * pcm.channels]
+        mono = frames.reshape(-1, pcm.channels).mean(axis=1, dtype=np.float32)
+        
+        # Zero-pad the tail to whole blocks; padding adds nothing to either sum
+        count = -(-len(mono) // block_frames)
+        blocks = np.zeros((count, block_frames), dtype=np.float32)
+        blocks.reshape(-1)[:len(mono)] = mono
+        
+        first_block = first // block_frames
+        sequences = np.stack([watermark_sequence(seed, first_block + i, block_frames) for i in range(count)])
+        
+        # Normalized correlation per block, N(0, 1) when the sequence is absent
+        correlation = np.einsum('ij,ij->i', blocks, sequences, dtype=np.float64)
+        norm = np.sqrt(np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64))
+        active = norm > WATERMARK_FLOOR * np.sqrt(block_frames)
+        scores.append(correlation[active] / norm[active])
+    
+    scores = np.concatenate(scores) if scores else np.zeros(0)
+    return float(scores.sum() / np.sqrt(len(scores))) if len(scores) else 0.0
+
+class PCMBuffer:
+    """Read-only decoded PCM shared by every analysis stage"""
+    
+    def __init__(self, path: str, sample_rate: int, channels: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        
+        # Memory-map the decoded file so stages share pages instead of copies
+        if os.path.getsize(path) > 0:
+            self.samples = np.memmap(path, dtype=np.float32, mode='r')
+        else:
+            self.samples = np.zeros(0, dtype=np.float32)
+        
+        self._analysis_mono: Optional[np.ndarray] = None
+        self._analysis_lock = threading.Lock()
+    
+    @property
+    def frames(self) -> int:
+        """Number of sample frames (samples per channel)"""
+        return len(self.samples) // self.channels
+    
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        return self.frames / self.sample_rate
+    
+    def ffmpeg_input(self):
+        """ffmpeg input node reading the raw buffer back"""
+        return ffmpeg.input(self.path, format='f32le', ar=self.sample_rate, ac=self.channels)
+    
+    def mono(self) -> np.ndarray:
+        """Mixdown of all channels to a mono float32 array"""
+        if self.channels == 1:
+            return self.samples
+        frames = self.samples[:self.frames * self.channels].reshape(-1, self.channels)
+        return frames.mean(axis=1, dtype=np.float32)
+    
+    @property
+    def analysis_rate(self) -> float:
+        """Sample rate of analysis_mono()"""
+        return self.sample_rate / max(1, self.sample_rate // ANALYSIS_SAMPLE_RATE)
+    
+    def analysis_mono(self) -> np.ndarray:
+        """Decimated mono mixdown for tempo and key analysis, computed once per buffer"""
+        with self._analysis_lock:
+            if self._analysis_mono is None:
+                factor = max(1, self.sample_rate // ANALYSIS_SAMPLE_RATE)
+                self._analysis_mono = decimate_mono(self.samples, self.channels, factor)
+        return self._analysis_mono
+    
+    def __getstate__(self):
+        # Worker processes re-map the file; samples never go through pickle
+        return {"path": self.path, "sample_rate": self.sample_rate, "channels": self.channels}
+    
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["sample_rate"], state["channels"])
+    
+    def close(self):
+        """Drop the memory map so the backing file can be removed"""
+        self.samples = np.zeros(0, dtype=np.float32)
+        self._analysis_mono = None
+
+# Analysis stages live at module level so a process pool can run them
+
+def scan_waveform(pcm: PCMBuffer, zoom_levels: List[int], width: int = 1200) -> Tuple[PeakAccumulator, Dict[int, PeakAccumulator]]:
+    """Single pass over the PCM feeding the image reduction and the mono zoom-level peaks"""
+    # The image keeps the original interleaved-sample binning
+    samples_per_pixel = max(1, len(pcm.samples) // width)
+    image_peaks = PeakAccumulator(len(pcm.samples), samples_per_pixel)
+    
+    # Zoom levels count frames of the mono mixdown, like audiowaveform
+    zoom_peaks = {
+        samples_per_pixel: PeakAccumulator(pcm.frames, samples_per_pixel)
+        for samples_per_pixel in zoom_levels
+    }
+    
+    chunk_size = WAVEFORM_CHUNK_SAMPLES - WAVEFORM_CHUNK_SAMPLES % pcm.channels
+    for chunk in iter_chunks(pcm.samples, chunk_size):
+        image_peaks.update(chunk)
+        
+        if zoom_peaks:
+            frames = chunk[:len(chunk) - len(chunk) % pcm.channels].reshape(-1, pcm.channels)
+            mono = frames.mean(axis=1, dtype=np.float32)
+            for peaks in zoom_peaks.values():
+                peaks.update(mono)
+    
+    return image_peaks, zoom_peaks
+
+def create_spectrogram(audio_data: np.ndarray, width: int = 1200, height: int = 300) -> Image.Image:
+    """Create spectrogram visualization from mono samples"""
+    fft_size = SPECTROGRAM_FFT_SIZE
+    hop_size = SPECTROGRAM_HOP_SIZE
+    
+    if len(audio_data) < fft_size:
+        # Create empty spectrogram
+        img = Image.new('RGB', (width, height), color='#1a1a1a')
+        return img
+    
+    # Batched STFT over blocks of frames into one float32 matrix
+    window = np.hanning(fft_size).astype(np.float32)
+    frame_count = 1 + (len(audio_data) - fft_size) // hop_size
+    spectrogram_array = np.empty((frame_count, fft_size // 2 + 1), dtype=np.float32)
+    
+    for first in range(0, frame_count, SPECTROGRAM_BLOCK_FRAMES):
+        count = min(SPECTROGRAM_BLOCK_FRAMES, frame_count - first)
+        start = first * hop_size
+        block = audio_data[start:start + (count - 1) * hop_size + fft_size]
+        spectrogram_array[first:first + count] = stft_magnitude(block, fft_size, hop_size, window)
+    
+    # Resample straight to the target size: time across, frequency up
+    spectrogram_array = resample_linear(spectrogram_array, width, axis=0)
+    spectrogram_array = resample_linear(spectrogram_array, height, axis=1)
+    
+    return render_spectrogram(spectrogram_array)
+
+def create_spectrogram_streaming(pcm: PCMBuffer, pooling: str = "mean", width: int = 1200, height: int = 300) -> Image.Image:
+    """Create spectrogram by pooling overlapping PCM blocks straight into image columns"""
+    fft_size = SPECTROGRAM_FFT_SIZE
+    hop_size = SPECTROGRAM_HOP_SIZE
+    
+    frame_count = 1 + (pcm.frames - fft_size) // hop_size if pcm.frames >= fft_size else 0
+    if frame_count < width:
+        # Short input: the full matrix is already smaller than the image
+        return create_spectrogram(pcm.mono(), width, height)
+    
+    window = np.hanning(fft_size).astype(np.float32)
+    use_max = pooling == "max"
+    columns = np.zeros((width, fft_size // 2 + 1), dtype=np.float32)
+    counts = np.zeros(width, dtype=np.int64)
+    
+    for first in range(0, frame_count, SPECTROGRAM_BLOCK_FRAMES):
+        count = min(SPECTROGRAM_BLOCK_FRAMES, frame_count - first)
+        
+        # Mix down only this block, overlapping the next by fft_size - hop_size frames
+        start = first * hop_size
+        end = start + (count - 1) * hop_size + fft_size
+        block = pcm.samples[start * pcm.channels:end * pcm.channels]
+        block = block.reshape(-1, pcm.channels).mean(axis=1, dtype=np.float32)
+        magnitudes = stft_magnitude(block, fft_size, hop_size, window)
+        
+        # Frames map to columns monotonically, so pool contiguous runs
+        frame_columns = (np.arange(first, first + count) * width) // frame_count
+        starts = np.flatnonzero(np.diff(frame_columns, prepend=-1))
+        targets = frame_columns[starts]
+        if use_max:
+            columns[targets] = np.maximum(columns[targets], np.maximum.reduceat(magnitudes, starts, axis=0))
+        else:
+            columns[targets] += np.add.reduceat(magnitudes, starts, axis=0)
+        counts[targets] += np.diff(np.append(starts, count))
+    
+    if not use_max:
+        columns /= np.maximum(counts, 1)[:, np.newaxis]
+    
+    return render_spectrogram(resample_linear(columns, height, axis=1))
+
+def render_spectrogram(magnitudes: np.ndarray) -> Image.Image:
+    """Log-scale and normalize a (width, height) magnitude grid into an image"""
+    # Normalize and scale
+    spectrogram_array = np.log(magnitudes + 1e-10, dtype=np.float32)
+    low = spectrogram_array.min()
+    span = spectrogram_array.max() - low
+    spectrogram_array = (spectrogram_array - low) / (span if span > 0 else 1)
+    
+    # Rows run from high frequencies at the top to low at the bottom
+    spectrogram_array = (spectrogram_array.T[::-1] * 255).astype(np.uint8)
+    img = Image.fromarray(np.ascontiguousarray(spectrogram_array), mode='L')
+    img = img.convert('RGB')
+    
+    return img
+
+def spectrogram_image(pcm: PCMBuffer, mode: str = "full", pooling: str = "mean") -> Image.Image:
+    """Spectrogram in the configured mode, mixing down inside whichever process runs it"""
+    if mode == "streaming":
+        return create_spectrogram_streaming(pcm, pooling)
+    return create_spectrogram(pcm.mono())
+
+def measure_loudness(pcm: PCMBuffer) -> Dict[str, Optional[float]]:
+    """Single chunked pass of the loudness meter over the PCM"""
+    meter = LoudnessMeter(pcm.sample_rate, pcm.channels)
+    
+    chunk_size = WAVEFORM_CHUNK_SAMPLES - WAVEFORM_CHUNK_SAMPLES % pcm.channels
+    for chunk in iter_chunks(pcm.samples[:pcm.frames * pcm.channels], chunk_size):
+        meter.update(chunk.reshape(-1, pcm.channels))
+    
+    return {
+        "integrated": meter.integrated,
+        "loudness_range": meter.loudness_range,
+        "true_peak": meter.true_peak
+    }
+
+def detect_bpm(pcm: PCMBuffer) -> Optional[float]:
+    """Onset envelope and autocorrelation tempo estimate"""
+    envelope = onset_strength(pcm.analysis_mono())
+    bpm = estimate_tempo(envelope, pcm.analysis_rate / ONSET_HOP_SIZE)
+    return round(bpm, 1) if bpm is not None else None
+
+def detect_key(pcm: PCMBuffer) -> Optional[str]:
+    """Chroma and key profile correlation"""
+    return estimate_key(chroma_vector(pcm.analysis_mono(), pcm.analysis_rate))
+
 class AudioProcessor:
     """Main audio processing service"""
     
     def __init__(self, config: AudioProcessingConfig):
         self.config = config
-        self.s3_client = boto3.client('s3')
-        self.redis_client = redis.from_url(config.redis_url)
+        self.s3_client = boto3.client(
+            's3',
+            endpoint_url=config.s3_endpoint_url,
+            config=BotoConfig(max_pool_connections=config.s3_max_concurrency * config.s3_max_concurrent_transfers)
+        )
+        self.metadata_store = MetadataStore.from_url(config.redis_url)
         self.executor = ThreadPoolExecutor(max_workers=config.max_workers)
         
+        # CPU-bound analysis stages optionally run in separate processes to escape the GIL
+        if config.analysis_executor == "process":
+            self.analysis_executor = ProcessPoolExecutor(
+                max_workers=config.analysis_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self.analysis_executor = self.executor
+        self.transcode_semaphore = asyncio.Semaphore(config.max_concurrent_transcodes)
+        
+        # Multipart transfer tuning shared by all S3 uploads and downloads
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.s3_multipart_threshold_mb * 1024 * 1024,
+            multipart_chunksize=config.s3_multipart_chunksize_mb * 1024 * 1024,
+            max_concurrency=config.s3_max_concurrency,
+            use_threads=True
+        )
+        self.transfer_semaphore = asyncio.Semaphore(config.s3_max_concurrent_transfers)
+        self.transfer_metrics: Dict[str, List[Dict]] = {}
+        self.stage_metrics: Dict[str, Dict[str, Dict]] = {}
+        self.dedup_stats = {"hits": 0, "misses": 0}
+        
         # Ensure temp directory exists
         Path(config.temp_dir).mkdir(parents=True, exist_ok=True)
         
@@ -70,50 +822,309 @@ class AudioProcessor:
     
     async def process_audio_file(self, file_id: str, s3_key: str) -> Dict:
         """Main processing pipeline for audio files"""
+        pcm = None
         try:
             logger.info(f"Starting processing for file_id: {file_id}, s3_key: {s3_key}")
             
+            if self.config.streaming_ingest:
+                # Stream the object body straight into ffmpeg; the content hash is only known once it has
+                # all arrived, so checkpoints are keyed on the object's ETag instead
+                body, etag = await self._open_s3_stream(s3_key)
+                try:
+                    return await self.process_audio_stream(file_id, body, os.path.basename(s3_key), f"etag:{etag}")
+                finally:
+                    # Return the HTTP connection to the pool whether or not the body was read to the end
+                    body.close()
+            
             # Download file from S3
-            local_path = await self._download_from_s3(s3_key, file_id)
+            local_path = await self._run_stage(file_id, "download", self._download_from_s3(s3_key, file_id))
+            
+            # Reuse the outputs of an identical master processed under another file_id
+            content_hash = await self._run_stage(file_id, "hash", self._hash_file(local_path))
+            if self.config.dedup_enabled:
+                result = await self._run_stage(
+                    file_id, "dedup", self._reuse_processed(file_id, content_hash, os.path.basename(s3_key), local_path)
+                )
+                if result is not None:
+                    result["stages"] = self.stage_metrics.pop(file_id, {})
+                    return result
+            
+            # Stages an earlier attempt on the same content already finished and uploaded
+            checkpoints = {}
+            if self.config.checkpoints_enabled:
+                checkpoints = await self._run_stage(file_id, "resume", self._load_checkpoints(file_id, content_hash))
             
             # Extract metadata
-            metadata = await self._extract_metadata(local_path, file_id)
+            metadata = await self._run_stage(file_id, "probe", self._extract_metadata(local_path, file_id))
+            metadata.content_hash = content_hash
+            
+            # Decode once into a shared PCM buffer for all analysis stages
+            pcm = None
+            if any(stage not in checkpoints for stage in self._pcm_stages()):
+                pcm = await self._run_stage(file_id, "decode", self._decode_pcm(local_path, file_id, metadata))
             
             # Process audio formats
-            processed_files = await self._process_formats(local_path, file_id, metadata)
+            processed_files = []
+            if "transcode" not in checkpoints:
+                processed_files = await self._run_stage(file_id, "transcode", self._process_formats(local_path, file_id, metadata))
             
-            # Generate waveforms and spectrograms
-            if self.config.waveform_enabled:
-                await self._generate_waveform(local_path, file_id)
+            return await self._complete_processing(file_id, metadata, pcm, processed_files, content_hash, checkpoints)
             
-            if self.config.spectrogram_enabled:
-                await self._generate_spectrogram(local_path, file_id)
+        except Exception as e:
+            logger.error(f"Error processing file {file_id}: {str(e)}")
+            self.transfer_metrics.pop(file_id, None)
+            self.stage_metrics.pop(file_id, None)
+            await self._update_processing_status(file_id, "failed", str(e))
+            raise
             
-            # Add watermark if enabled
-            if self.config.watermark_enabled:
-                await self._add_watermark(local_path, file_id)
+        finally:
+            # The master, the multi-GB PCM and every output go whether the job finished or failed
+            await self._cleanup_job(file_id, pcm)
+    
+    async def process_audio_stream(self, file_id: str, stream: BinaryIO, filename: str,
+                                   checkpoint_key: Optional[str] = None) -> Dict:
+        """Processing pipeline for a byte stream that is never written to disk"""
+        pcm = None
+        try:
+            logger.info(f"Starting streaming processing for file_id: {file_id}, filename: {filename}")
             
-            # Upload processed files to S3
-            upload_results = await self._upload_to_s3(processed_files, file_id)
+            # checkpoint_key names the content before it is read (e.g. an S3 ETag); without one a retry could
+            # never find its checkpoints, so none are written. The stream is still ingested in full on resume,
+            # since the remaining stages need its PCM and probe metadata
+            checkpoints = {}
+            if self.config.checkpoints_enabled and checkpoint_key:
+                checkpoints = await self._run_stage(file_id, "resume", self._load_checkpoints(file_id, checkpoint_key))
             
-            # Update metadata
-            metadata.processing_status = "completed"
-            await self._update_metadata(file_id, metadata)
+            # Probe, decode and transcode while the stream is still arriving
+            metadata, pcm, processed_files = await self._run_stage(
+                file_id, "ingest", self._ingest_stream(stream, file_id, filename)
+            )
             
-            # Cleanup
-            await self._cleanup_temp_files(local_path)
+            # The content hash is only known now, so a duplicate still costs the ingest but skips every later stage
+            if self.config.dedup_enabled:
+                result = await self._run_stage(
+                    file_id, "dedup", self._reuse_processed(file_id, metadata.content_hash, filename, pcm=pcm)
+                )
+                if result is not None:
+                    result["stages"] = self.stage_metrics.pop(file_id, {})
+                    return result
             
-            return {
-                "file_id": file_id,
-                "status": "completed",
-                "processed_files": upload_results,
-                "metadata": metadata.dict()
-            }
+            return await self._complete_processing(file_id, metadata, pcm, processed_files, checkpoint_key, checkpoints)
             
         except Exception as e:
-            logger.error(f"Error processing file {file_id}: {str(e)}")
+            logger.error(f"Error processing stream {file_id}: {str(e)}")
+            self.transfer_metrics.pop(file_id, None)
+            self.stage_metrics.pop(file_id, None)
             await self._update_processing_status(file_id, "failed", str(e))
             raise
+            
+        finally:
+            await self._cleanup_job(file_id, pcm)
+    
+    async def _complete_processing(self, file_id: str, metadata: AudioMetadata, pcm: Optional[PCMBuffer],
+                                   processed_files: List[str], checkpoint_key: Optional[str],
+                                   checkpoints: Optional[Dict[str, Dict]] = None) -> Dict:
+        """Analysis, visualization, watermarking and upload stages shared by both ingest modes"""
+        checkpoints = checkpoints or {}
+        
+        def run(stage: str, produce: Callable[[], Awaitable[Dict]]):
+            self.metadata_store.update_status(file_id, "processing", stage=stage)
+            return self._checkpointed(file_id, checkpoint_key, stage, checkpoints, produce)
+        
+        # Analysis, visualizations and watermark all read the PCM independently, so run them together.
+        # Each stage uploads its own outputs as soon as it finishes, so a crash loses only unfinished stages
+        stages = {
+            "transcode": run("transcode", lambda: self._upload_transcodes(processed_files, file_id)),
+            "analysis": run("analysis", lambda: self._run_analysis(pcm, metadata, file_id))
+        }
+        if self.config.waveform_enabled:
+            stages["waveform"] = run("waveform", lambda: self._artifact_stage(
+                file_id, "waveform", self._generate_waveform(pcm, file_id)
+            ))
+        
+        if self.config.spectrogram_enabled:
+            stages["spectrogram"] = run("spectrogram", lambda: self._artifact_stage(
+                file_id, "spectrogram", self._generate_spectrogram(pcm, file_id)
+            ))
+        
+        # Add watermark if enabled
+        if self.config.watermark_enabled:
+            stages["watermark"] = run("watermark", lambda: self._artifact_stage(
+                file_id, "watermark", self._add_watermark(pcm, file_id)
+            ))
+        
+        records = dict(zip(stages, await asyncio.gather(*stages.values())))
+        
+        # Analysis results may come from an earlier attempt's checkpoint
+        for field, value in records["analysis"]["metadata"].items():
+            setattr(metadata, field, value)
+        
+        upload_results = records["transcode"]["processed_files"]
+        artifact_keys = [key for record in records.values() for key in record.get("artifacts", [])]
+        
+        # Update metadata; the completed status rides in the same pipeline
+        metadata.processing_status = "completed"
+        self.metadata_store.update_status(file_id, "completed", error=None)
+        await self._update_metadata(file_id, metadata)
+        
+        # Register outputs for future duplicates of this master, but only a complete set;
+        # duplicates would otherwise inherit the missing outputs forever
+        incomplete = [stage for stage, record in records.items() if not record.get("complete", True)]
+        if self.config.dedup_enabled and metadata.content_hash:
+            if incomplete:
+                logger.warning(f"Not registering {file_id} for dedup, incomplete stages: {', '.join(incomplete)}")
+            else:
+                await self._register_processed(metadata, upload_results, artifact_keys)
+        
+        return {
+            "file_id": file_id,
+            "status": "completed",
+            "processed_files": upload_results,
+            "metadata": metadata.dict(),
+            "transfers": self.transfer_metrics.pop(file_id, []),
+            "stages": self.stage_metrics.pop(file_id, {})
+        }
+    
+    async def _cleanup_job(self, file_id: str, pcm: Optional[PCMBuffer]):
+        """Unmap the decoded PCM and delete every local file the job may have left, partial ones included"""
+        if pcm is not None:
+            pcm.close()
+        await self._cleanup_temp_files(*self._job_temp_files(file_id))
+    
+    def _job_temp_files(self, file_id: str) -> List[str]:
+        """Every path in the temp directory a job for file_id can write"""
+        names = [
+            f"{file_id}_original",
+            f"{file_id}_pcm.f32",
+            f"{file_id}_waveform.png",
+            f"{file_id}_spectrogram.png",
+            f"{file_id}_watermarked"
+        ]
+        names += [f"{file_id}_{format_type}" for format_type in self.config.output_formats]
+        names += [
+            f"{file_id}_{samples_per_pixel}.{peak_format}"
+            for samples_per_pixel in self.config.waveform_zoom_levels
+            for peak_format in self.config.waveform_peak_formats
+        ]
+        return [os.path.join(self.config.temp_dir, name) for name in names]
+    
+    def _pcm_stages(self) -> List[str]:
+        """Stages that read the decoded PCM"""
+        enabled = {
+            "waveform": self.config.waveform_enabled,
+            "spectrogram": self.config.spectrogram_enabled,
+            "watermark": self.config.watermark_enabled
+        }
+        return ["analysis"] + [stage for stage, on in enabled.items() if on]
+    
+    async def _checkpointed(self, file_id: str, checkpoint_key: Optional[str], stage: str,
+                            checkpoints: Dict[str, Dict], produce: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Run a stage and checkpoint its record, or reuse the record an earlier attempt left"""
+        if stage in checkpoints:
+            return checkpoints[stage]
+        
+        record = await produce()
+        
+        # Partial results are kept for this run but redone on a retry; the flag stays on the returned record
+        if record.get("complete", True) and checkpoint_key and self.config.checkpoints_enabled:
+            try:
+                checkpoint = {key: value for key, value in record.items() if key != "complete"}
+                await self.metadata_store.set_checkpoint(
+                    file_id, checkpoint_key, stage, checkpoint, self.config.checkpoint_ttl_seconds
+                )
+            except Exception as e:
+                logger.error(f"Error checkpointing {stage} for {file_id}: {str(e)}")
+        
+        return record
+    
+    async def _load_checkpoints(self, file_id: str, checkpoint_key: str) -> Dict[str, Dict]:
+        """Checkpointed stages of an earlier attempt whose outputs are all still in the output bucket"""
+        try:
+            checkpoints = await self.metadata_store.get_checkpoints(file_id, checkpoint_key)
+        except Exception as e:
+            logger.error(f"Error reading checkpoints for {file_id}: {str(e)}")
+            return {}
+        
+        async def verified(stage: str, record: Dict) -> bool:
+            keys = [entry["s3_key"] for entry in record.get("processed_files", [])] + record.get("artifacts", [])
+            exists = await asyncio.gather(*(self._object_exists(key) for key in keys))
+            if not all(exists):
+                logger.warning(f"Outputs of checkpointed {stage} for {file_id} are missing, redoing it")
+            return all(exists)
+        
+        results = await asyncio.gather(*(verified(stage, record) for stage, record in checkpoints.items()))
+        resumed = {stage: record for (stage, record), ok in zip(checkpoints.items(), results) if ok}
+        
+        if resumed:
+            logger.info(f"Resuming {file_id}, skipping {', '.join(sorted(resumed))}")
+        return resumed
+    
+    async def _object_exists(self, s3_key: str) -> bool:
+        """Whether a key exists in the output bucket"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self.executor,
+                functools.partial(self.s3_client.head_object, Bucket=self.config.output_bucket, Key=s3_key)
+            )
+            return True
+        except Exception:
+            return False
+    
+    async def _run_analysis(self, pcm: PCMBuffer, metadata: AudioMetadata, file_id: str) -> Dict:
+        """Analysis stage, returning the metadata fields it filled in"""
+        complete = await self._timed(file_id, "analysis", self._analyze_audio(pcm, metadata))
+        
+        # A None from a failed measurement must not be checkpointed, or every retry would reuse it
+        return {
+            "metadata": {field: getattr(metadata, field) for field in ANALYSIS_FIELDS},
+            "complete": complete
+        }
+    
+    async def _upload_transcodes(self, processed_files: List[str], file_id: str) -> Dict:
+        """Upload the transcoded formats"""
+        try:
+            upload_results = await self._timed(file_id, "transcode_upload", self._upload_to_s3(processed_files, file_id))
+        finally:
+            # Uploaded or not, the local copies are never read again
+            await self._cleanup_temp_files(*processed_files)
+        return {
+            "processed_files": upload_results,
+            "complete": len(upload_results) == len(self.config.output_formats)
+        }
+    
+    async def _artifact_stage(self, file_id: str, stage: str, produce: Awaitable[List[Tuple[str, str]]]) -> Dict:
+        """Run a stage that produces files and upload them"""
+        artifacts = await self._timed(file_id, stage, produce)
+        try:
+            artifact_keys = await self._timed(file_id, f"{stage}_upload", self._upload_artifacts(artifacts, file_id))
+        finally:
+            await self._cleanup_temp_files(*(file_path for file_path, _ in artifacts))
+        return {
+            "artifacts": artifact_keys,
+            "complete": bool(artifacts) and len(artifact_keys) == len(artifacts)
+        }
+    
+    @contextlib.contextmanager
+    def _stage(self, file_id: str, stage: str):
+        """Record wall time for one stage of a file's pipeline"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metrics = {"wall_seconds": time.perf_counter() - start}
+            self.stage_metrics.setdefault(file_id, {})[stage] = metrics
+            STAGE_WALL_SECONDS.labels(stage).observe(metrics["wall_seconds"])
+    
+    async def _timed(self, file_id: str, stage: str, awaitable):
+        """Await one pipeline stage under _stage instrumentation"""
+        with self._stage(file_id, stage):
+            return await awaitable
+    
+    async def _run_stage(self, file_id: str, stage: str, awaitable):
+        """Publish stage as the job's current step, then run it"""
+        self.metadata_store.update_status(file_id, "processing", stage=stage)
+        return await self._timed(file_id, stage, awaitable)
     
     async def _download_from_s3(self, s3_key: str, file_id: str) -> str:
         """Download file from S3 to local temp directory"""
@@ -121,47 +1132,226 @@ class AudioProcessor:
         
         logger.info(f"Downloading {s3_key} to {local_path}")
         
-        self.s3_client.download_file(
-            self.config.input_bucket,
-            s3_key,
-            local_path
-        )
+        async with self.transfer_semaphore:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    self.s3_client.download_file,
+                    self.config.input_bucket,
+                    s3_key,
+                    local_path,
+                    Config=self.transfer_config
+                )
+            )
+        
+        self._record_transfer(file_id, "download", s3_key, os.path.getsize(local_path), time.perf_counter() - start)
         
         return local_path
     
+    async def _open_s3_stream(self, s3_key: str) -> Tuple[BinaryIO, str]:
+        """Open the S3 object body as a readable stream, with the object's ETag"""
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self.executor,
+            functools.partial(self.s3_client.get_object, Bucket=self.config.input_bucket, Key=s3_key)
+        )
+        return response['Body'], response['ETag'].strip('"')
+    
+    async def _ingest_stream(self, stream: BinaryIO, file_id: str, filename: str) -> Tuple[AudioMetadata, PCMBuffer, List[str]]:
+        """Probe the head of a stream, then decode and transcode it in one ffmpeg pass from stdin"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        
+        # Probe only the first bytes so decoding can start immediately
+        head = await loop.run_in_executor(self.executor, stream.read, self.config.stream_probe_size_kb * 1024)
+        probe = await self._probe_bytes(head)
+        metadata = self._metadata_from_probe(probe, file_id, filename)
+        
+        # One graph: shared PCM buffer plus every output format
+        pcm_path = self._pcm_path(file_id)
+        targets = [
+            (os.path.join(self.config.temp_dir, f"{file_id}_{format_type}"), OUTPUT_FORMAT_ARGS[format_type])
+            for format_type in self.config.output_formats if format_type in OUTPUT_FORMAT_ARGS
+        ]
+        branches = ffmpeg.input('pipe:0').audio.filter_multi_output('asplit', len(targets) + 1)
+        outputs = [
+            ffmpeg.output(
+                branches[0],
+                pcm_path,
+                format='f32le',
+                acodec='pcm_f32le',
+                ar=metadata.sample_rate,
+                ac=metadata.channels
+            )
+        ]
+        outputs += [
+            ffmpeg.output(branches[i + 1], output_path, **output_args)
+            for i, (output_path, output_args) in enumerate(targets)
+        ]
+        
+        received = {"bytes": 0}
+        content_hash = hashlib.sha256()
+        
+        async def chunks() -> AsyncIterator[bytes]:
+            chunk = head
+            while chunk:
+                received["bytes"] += len(chunk)
+                content_hash.update(chunk)
+                yield chunk
+                chunk = await loop.run_in_executor(self.executor, stream.read, self.config.stream_chunk_size_kb * 1024)
+        
+        logger.info(f"Streaming {filename} into ffmpeg for {file_id}")
+        await self._run_ffmpeg(ffmpeg.merge_outputs(*outputs), input_stream=chunks())
+        
+        self._record_transfer(file_id, "download", filename, received["bytes"], time.perf_counter() - start)
+        
+        # Fill in what the truncated probe could not know
+        pcm = PCMBuffer(pcm_path, metadata.sample_rate, metadata.channels)
+        metadata.duration = pcm.duration
+        metadata.file_size = received["bytes"]
+        metadata.content_hash = content_hash.hexdigest()
+        if metadata.bitrate is None and pcm.duration > 0:
+            metadata.bitrate = int(received["bytes"] * 8 / pcm.duration)
+        
+        return metadata, pcm, [output_path for output_path, _ in targets]
+    
+    async def _probe_bytes(self, data: bytes) -> Dict:
+        """Run ffprobe on an in-memory byte prefix"""
+        process = await asyncio.create_subprocess_exec(
+            'ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', '-i', 'pipe:0',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        out, err = await process.communicate(input=data)
+        
+        if process.returncode != 0:
+            raise ffmpeg.Error('ffprobe', out, err)
+        
+        return json.loads(out.decode('utf-8'))
+    
+    async def _upload_file(self, file_path: str, s3_key: str, file_id: str) -> int:
+        """Upload one file with multipart transfer settings, returning its size"""
+        size = os.path.getsize(file_path)
+        
+        async with self.transfer_semaphore:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    self.s3_client.upload_file,
+                    file_path,
+                    self.config.output_bucket,
+                    s3_key,
+                    Config=self.transfer_config
+                )
+            )
+        
+        self._record_transfer(file_id, "upload", s3_key, size, time.perf_counter() - start)
+        
+        return size
+    
+    def _record_transfer(self, file_id: str, direction: str, s3_key: str, size: int, elapsed: float):
+        """Record throughput for a single S3 transfer"""
+        throughput = size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        self.transfer_metrics.setdefault(file_id, []).append({
+            "direction": direction,
+            "s3_key": s3_key,
+            "bytes": size,
+            "seconds": round(elapsed, 3),
+            "throughput_mbps": round(throughput, 2)
+        })
+        logger.info(f"S3 {direction} {s3_key}: {size} bytes in {elapsed:.2f}s ({throughput:.1f} MB/s)")
+    
     async def _extract_metadata(self, file_path: str, file_id: str) -> AudioMetadata:
         """Extract audio metadata using ffmpeg"""
         try:
-            probe = ffmpeg.probe(file_path)
-            audio_info = next(s for s in probe['streams'] if s['codec_type'] == 'audio')
-            
-            metadata = AudioMetadata(
-                file_id=file_id,
-                original_filename=os.path.basename(file_path),
-                duration=float(probe['format']['duration']),
-                sample_rate=int(audio_info['sample_rate']),
-                channels=int(audio_info['channels']),
-                bit_depth=int(audio_info.get('bits_per_sample', 16)),
-                format=audio_info['codec_name'],
-                file_size=int(probe['format']['size']),
-                bitrate=int(probe['format']['bit_rate']) if 'bit_rate' in probe['format'] else None
-            )
-            
-            # Calculate loudness
-            metadata.loudness = await self._calculate_loudness(file_path)
-            
-            # Detect BPM and key (basic implementation)
-            metadata.bpm = await self._detect_bpm(file_path)
-            metadata.key = await self._detect_key(file_path)
+            loop = asyncio.get_running_loop()
+            probe = await loop.run_in_executor(self.executor, ffmpeg.probe, file_path)
             
-            return metadata
+            return self._metadata_from_probe(probe, file_id, os.path.basename(file_path))
             
         except Exception as e:
             logger.error(f"Error extracting metadata: {str(e)}")
             raise
     
+    def _metadata_from_probe(self, probe: Dict, file_id: str, filename: str) -> AudioMetadata:
+        """Build metadata from ffprobe output (format fields may be missing for partial streams)"""
+        audio_info = next(s for s in probe['streams'] if s['codec_type'] == 'audio')
+        
+        return AudioMetadata(
+            file_id=file_id,
+            original_filename=filename,
+            duration=float(probe['format'].get('duration', 0.0)),
+            sample_rate=int(audio_info['sample_rate']),
+            channels=int(audio_info['channels']),
+            bit_depth=int(audio_info.get('bits_per_sample', 16)),
+            format=audio_info['codec_name'],
+            file_size=int(probe['format'].get('size', 0)),
+            bitrate=int(probe['format']['bit_rate']) if 'bit_rate' in probe['format'] else None
+        )
+    
+    def _pcm_path(self, file_id: str) -> str:
+        """Where a job's decoded PCM lives in the temp directory"""
+        return os.path.join(self.config.temp_dir, f"{file_id}_pcm.f32")
+    
+    async def _decode_pcm(self, input_path: str, file_id: str, metadata: AudioMetadata) -> PCMBuffer:
+        """Decode the source once to interleaved f32le PCM in the temp directory"""
+        pcm_path = self._pcm_path(file_id)
+        
+        logger.info(f"Decoding {input_path} to {pcm_path}")
+        
+        stream = ffmpeg.input(input_path)
+        stream = ffmpeg.output(
+            stream,
+            pcm_path,
+            format='f32le',
+            acodec='pcm_f32le',
+            ar=metadata.sample_rate,
+            ac=metadata.channels
+        )
+        await self._run_ffmpeg(stream)
+        
+        return PCMBuffer(pcm_path, metadata.sample_rate, metadata.channels)
+    
+    async def _analyze_audio(self, pcm: PCMBuffer, metadata: AudioMetadata) -> bool:
+        """Run content analysis on the shared PCM buffer, returning False if any measurement failed"""
+        # Measure loudness, BPM and key concurrently
+        results = dict(zip(("loudness", "bpm", "key"), await asyncio.gather(
+            self._calculate_loudness(pcm),
+            self._detect_bpm(pcm),
+            self._detect_key(pcm),
+            return_exceptions=True
+        )))
+        
+        # Failed measurements leave their fields None, unlike a legitimately empty result such as silence
+        failed = [name for name, result in results.items() if isinstance(result, Exception)]
+        for name in failed:
+            logger.error(f"Error measuring {name}: {str(results[name])}")
+            results[name] = {"integrated": None, "loudness_range": None, "true_peak": None} if name == "loudness" else None
+        
+        loudness = results["loudness"]
+        metadata.bpm = results["bpm"]
+        metadata.key = results["key"]
+        metadata.loudness = loudness["integrated"]
+        metadata.loudness_range = loudness["loudness_range"]
+        metadata.true_peak = loudness["true_peak"]
+        
+        return not failed
+    
     async def _process_formats(self, input_path: str, file_id: str, metadata: AudioMetadata) -> List[str]:
         """Process audio into different formats"""
+        if self.config.single_pass_transcode and len(self.config.output_formats) > 1:
+            try:
+                return await self._transcode_single_pass(input_path, file_id)
+            except Exception as e:
+                # Fall back to one process per format so a single bad encoder
+                # does not take the other outputs down with it
+                logger.warning(f"Single-pass transcode failed, retrying per format: {str(e)}")
+        
         processed_files = []
         
         for format_type in self.config.output_formats:
@@ -183,43 +1373,117 @@ class AudioProcessor:
         
         return processed_files
     
+    async def _transcode_single_pass(self, input_path: str, file_id: str) -> List[str]:
+        """Encode every configured output format from a single decode using asplit"""
+        targets = []
+        for format_type in self.config.output_formats:
+            if format_type not in OUTPUT_FORMAT_ARGS:
+                logger.error(f"Error processing format {format_type}: unsupported output format")
+                continue
+            output_path = os.path.join(self.config.temp_dir, f"{file_id}_{format_type}")
+            targets.append((output_path, OUTPUT_FORMAT_ARGS[format_type]))
+        
+        if not targets:
+            return []
+        
+        # Fan the decoded stream out to one encoder per output
+        audio = ffmpeg.input(input_path).audio
+        if len(targets) > 1:
+            branches = audio.filter_multi_output('asplit', len(targets))
+            sources = [branches[i] for i in range(len(targets))]
+        else:
+            sources = [audio]
+        
+        outputs = [
+            ffmpeg.output(source, output_path, **output_args)
+            for source, (output_path, output_args) in zip(sources, targets)
+        ]
+        await self._run_ffmpeg(ffmpeg.merge_outputs(*outputs))
+        
+        return [output_path for output_path, _ in targets]
+    
     async def _convert_to_flac(self, input_path: str, output_path: str):
         """Convert audio to FLAC format"""
         stream = ffmpeg.input(input_path)
-        stream = ffmpeg.output(stream, output_path, acodec='flac', compression_level=8)
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        stream = ffmpeg.output(stream, output_path, **OUTPUT_FORMAT_ARGS["flac"])
+        await self._run_ffmpeg(stream)
     
     async def _convert_to_mp3(self, input_path: str, output_path: str, bitrate: str = "320k"):
         """Convert audio to MP3 format"""
         stream = ffmpeg.input(input_path)
-        stream = ffmpeg.output(stream, output_path, acodec='mp3', ab=bitrate, q=0)
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        stream = ffmpeg.output(stream, output_path, **{**OUTPUT_FORMAT_ARGS["mp3_320"], "ab": bitrate})
+        await self._run_ffmpeg(stream)
     
-    async def _generate_waveform(self, input_path: str, file_id: str):
-        """Generate waveform visualization"""
-        try:
-            # Extract audio data
-            out, _ = ffmpeg.input(input_path).output('pipe:', format='f32le', acodec='pcm_f32le').run(capture_stdout=True, quiet=True)
-            
-            # Convert to numpy array
-            audio_data = np.frombuffer(out, np.float32)
+    async def _run_ffmpeg(self, stream, capture_stdout: bool = False,
+                          input_stream: Optional[AsyncIterator[bytes]] = None) -> bytes:
+        """Run an ffmpeg graph as an asyncio subprocess without blocking the event loop"""
+        args = ffmpeg.compile(stream, overwrite_output=True)
+        
+        # Bound the number of concurrent ffmpeg processes per processor
+        async with self.transcode_semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if input_stream is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
             
-            # Generate waveform
-            waveform = self._create_waveform(audio_data)
+            if input_stream is not None:
+                # Drain output pipes while feeding stdin so neither side can stall
+                output = asyncio.gather(
+                    process.stdout.read() if capture_stdout else asyncio.sleep(0, b''),
+                    process.stderr.read()
+                )
+                try:
+                    async for chunk in input_stream:
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    # ffmpeg exited early; its return code and stderr explain why
+                    pass
+                except Exception:
+                    # The source failed mid-stream; do not leave ffmpeg waiting on stdin
+                    process.kill()
+                    await process.wait()
+                    
+                    # Settle the pipe readers so no task or exception is left unretrieved
+                    output.cancel()
+                    await asyncio.gather(output, return_exceptions=True)
+                    raise
+                finally:
+                    process.stdin.close()
+                out, err = await output
+                await process.wait()
+            else:
+                out, err = await process.communicate()
+        
+        if process.returncode != 0:
+            raise ffmpeg.Error(args[0], out, err)
+        
+        return out
+    
+    async def _generate_waveform(self, pcm: PCMBuffer, file_id: str) -> List[Tuple[str, str]]:
+        """Generate waveform visualization and peak files, returning (local path, S3 key) pairs"""
+        try:
+            # Scan the PCM once for the image and every zoom level, off the event loop
+            loop = asyncio.get_running_loop()
+            image_peaks, zoom_peaks = await loop.run_in_executor(
+                self.analysis_executor, scan_waveform, pcm, self.config.waveform_zoom_levels
+            )
+            waveform = self._render_waveform(image_peaks.rms, 1200, 300)
             
             # Save as PNG
             waveform_path = os.path.join(self.config.temp_dir, f"{file_id}_waveform.png")
             waveform.save(waveform_path)
             
-            # Upload to S3
-            self.s3_client.upload_file(
-                waveform_path,
-                self.config.output_bucket,
-                f"waveforms/{file_id}.png"
-            )
+            # Precomputed peaks for client-side zooming
+            peak_files = self._write_peak_files(zoom_peaks, pcm.sample_rate, file_id)
+            
+            return [(waveform_path, f"waveforms/{file_id}.png")] + peak_files
             
         except Exception as e:
             logger.error(f"Error generating waveform: {str(e)}")
+            return []
     
     def _create_waveform(self, audio_data: np.ndarray, width: int = 1200, height: int = 300) -> Image.Image:
         """Create waveform visualization"""
@@ -228,234 +1492,326 @@ class AudioProcessor:
         if samples_per_pixel < 1:
             samples_per_pixel = 1
         
-        # Calculate RMS values for each pixel
-        rms_values = []
-        for i in range(0, len(audio_data), samples_per_pixel):
-            chunk = audio_data[i:i + samples_per_pixel]
-            rms = np.sqrt(np.mean(chunk ** 2))
-            rms_values.append(rms)
+        # Stream fixed-size chunks through the per-pixel reduction
+        peaks = PeakAccumulator(len(audio_data), samples_per_pixel)
+        for chunk in iter_chunks(audio_data, WAVEFORM_CHUNK_SAMPLES):
+            peaks.update(chunk)
+        
+        return self._render_waveform(peaks.rms, width, height)
+    
+    def _write_peak_files(self, zoom_peaks: Dict[int, PeakAccumulator], sample_rate: int, file_id: str) -> List[Tuple[str, str]]:
+        """Write audiowaveform-compatible peak files, returning (local path, S3 key) pairs"""
+        bits = self.config.waveform_peak_bits
+        peak_files = []
+        
+        for samples_per_pixel, peaks in zoom_peaks.items():
+            for peak_format in self.config.waveform_peak_formats:
+                file_name = f"{file_id}_{samples_per_pixel}.{peak_format}"
+                peak_path = os.path.join(self.config.temp_dir, file_name)
+                
+                if peak_format == "dat":
+                    with open(peak_path, 'wb') as f:
+                        f.write(encode_peaks_dat(peaks, sample_rate, bits))
+                elif peak_format == "json":
+                    with open(peak_path, 'w') as f:
+                        f.write(encode_peaks_json(peaks, sample_rate, bits))
+                else:
+                    logger.error(f"Unsupported peak format: {peak_format}")
+                    continue
+                
+                peak_files.append((peak_path, f"waveforms/{file_name}"))
         
+        return peak_files
+    
+    def _render_waveform(self, rms_values: np.ndarray, width: int, height: int) -> Image.Image:
+        """Draw per-pixel RMS values as centered columns"""
         # Normalize and scale
-        max_rms = max(rms_values) if rms_values else 1
-        scaled_values = [int((rms / max_rms) * height) for rms in rms_values]
+        max_rms = rms_values.max() if len(rms_values) else 1
+        if max_rms <= 0:
+            max_rms = 1
+        scaled_values = (rms_values[:width] / max_rms * height).astype(np.int64)
         
-        # Create image
-        img = Image.new('RGB', (width, height), color='#1a1a1a')
-        pixels = img.load()
+        # Column extents around the center line
+        y_center = height // 2
+        y_start = np.maximum(0, y_center - scaled_values // 2)
+        y_end = np.minimum(height, y_center + scaled_values // 2)
         
-        for x, amplitude in enumerate(scaled_values):
-            if x >= width:
-                break
-            
-            # Draw waveform line
-            y_center = height // 2
-            y_start = max(0, y_center - amplitude // 2)
-            y_end = min(height, y_center + amplitude // 2)
-            
-            for y in range(y_start, y_end):
-                pixels[x, y] = (0, 255, 150)  # Green color
+        # Draw all columns at once
+        rows = np.arange(height)[:, np.newaxis]
+        mask = (rows >= y_start) & (rows < y_end)
         
-        return img
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[:] = (0x1a, 0x1a, 0x1a)
+        pixels[:, :len(scaled_values)][mask] = (0, 255, 150)  # Green color
+        
+        return Image.fromarray(pixels, mode='RGB')
     
-    async def _generate_spectrogram(self, input_path: str, file_id: str):
-        """Generate spectrogram visualization"""
+    async def _generate_spectrogram(self, pcm: PCMBuffer, file_id: str) -> List[Tuple[str, str]]:
+        """Generate spectrogram visualization, returning (local path, S3 key) pairs"""
         try:
-            # Extract audio data
-            out, _ = ffmpeg.input(input_path).output('pipe:', format='f32le', acodec='pcm_f32le').run(capture_stdout=True, quiet=True)
-            
-            # Convert to numpy array
-            audio_data = np.frombuffer(out, np.float32)
-            
-            # Generate spectrogram
-            spectrogram = self._create_spectrogram(audio_data)
+            # Generate spectrogram off the event loop
+            loop = asyncio.get_running_loop()
+            spectrogram = await loop.run_in_executor(
+                self.analysis_executor,
+                spectrogram_image,
+                pcm,
+                self.config.spectrogram_mode,
+                self.config.spectrogram_pooling
+            )
             
             # Save as PNG
             spectrogram_path = os.path.join(self.config.temp_dir, f"{file_id}_spectrogram.png")
             spectrogram.save(spectrogram_path)
             
-            # Upload to S3
-            self.s3_client.upload_file(
-                spectrogram_path,
-                self.config.output_bucket,
-                f"spectrograms/{file_id}.png"
-            )
+            return [(spectrogram_path, f"spectrograms/{file_id}.png")]
             
         except Exception as e:
             logger.error(f"Error generating spectrogram: {str(e)}")
+            return []
     
-    def _create_spectrogram(self, audio_data: np.ndarray, width: int = 1200, height: int = 300) -> Image.Image:
-        """Create spectrogram visualization"""
-        # Simple spectrogram implementation
-        # In production, use librosa or scipy for better spectrograms
-        
-        # Create a simple frequency-domain representation
-        fft_size = 1024
-        hop_size = fft_size // 4
-        
-        spectrogram_data = []
-        
-        for i in range(0, len(audio_data) - fft_size, hop_size):
-            chunk = audio_data[i:i + fft_size]
-            fft = np.fft.fft(chunk)
-            magnitude = np.abs(fft[:fft_size // 2])
-            spectrogram_data.append(magnitude)
-        
-        if not spectrogram_data:
-            # Create empty spectrogram
-            img = Image.new('RGB', (width, height), color='#1a1a1a')
-            return img
-        
-        # Convert to image
-        spectrogram_array = np.array(spectrogram_data)
-        
-        # Normalize and scale
-        spectrogram_array = np.log(spectrogram_array + 1e-10)
-        spectrogram_array = (spectrogram_array - spectrogram_array.min()) / (spectrogram_array.max() - spectrogram_array.min())
-        
-        # Resize to target dimensions
-        from scipy.ndimage import zoom
-        zoom_factors = (height / spectrogram_array.shape[0], width / spectrogram_array.shape[1])
-        spectrogram_array = zoom(spectrogram_array, zoom_factors, order=1)
-        
-        # Convert to image
-        spectrogram_array = (spectrogram_array * 255).astype(np.uint8)
-        img = Image.fromarray(spectrogram_array, mode='L')
-        img = img.convert('RGB')
-        
-        return img
-    
-    async def _add_watermark(self, input_path: str, file_id: str):
-        """Add digital watermark to audio"""
+    async def _add_watermark(self, pcm: PCMBuffer, file_id: str) -> List[Tuple[str, str]]:
+        """Embed the keyed watermark while streaming PCM into the encoder, returning (local path, S3 key) pairs"""
         try:
-            # Generate watermark signal
-            watermark = self._generate_watermark(file_id)
-            
-            # Apply watermark
             output_path = os.path.join(self.config.temp_dir, f"{file_id}_watermarked")
+            seed = watermark_seed(file_id, self.config.watermark_key.get_secret_value())
+            blocks = iter_watermarked(pcm, seed, self.config.watermark_strength_db)
+            loop = asyncio.get_running_loop()
             
-            # Mix watermark with original audio
-            stream = ffmpeg.input(input_path)
-            watermark_stream = ffmpeg.input('anullsrc', f='lavfi', t=10)  # Placeholder
-            stream = ffmpeg.filter([stream, watermark_stream], 'amix=inputs=2:duration=first')
-            stream = ffmpeg.output(stream, output_path)
-            ffmpeg.run(stream, overwrite_output=True, quiet=True)
+            async def chunks() -> AsyncIterator[bytes]:
+                # Mark the next block off the event loop while ffmpeg encodes the previous one
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, next, blocks, None)
+                    if chunk is None:
+                        return
+                    yield chunk
             
-            # Upload watermarked version
-            self.s3_client.upload_file(
-                output_path,
-                self.config.output_bucket,
-                f"watermarked/{file_id}.flac"
-            )
+            stream = ffmpeg.input('pipe:', format='f32le', ar=pcm.sample_rate, ac=pcm.channels)
+            stream = ffmpeg.output(stream, output_path, **OUTPUT_FORMAT_ARGS["flac"])
+            await self._run_ffmpeg(stream, input_stream=chunks())
+            
+            return [(output_path, f"watermarked/{file_id}.flac")]
             
         except Exception as e:
             logger.error(f"Error adding watermark: {str(e)}")
+            return []
     
-    def _generate_watermark(self, file_id: str) -> np.ndarray:
-        """Generate digital watermark signal"""
-        # Simple watermark implementation
-        # In production, use more sophisticated watermarking techniques
+    async def verify_watermark(self, file_path: str, file_id: str) -> Dict:
+        """Decode a local audio file and check it for file_id's watermark"""
+        metadata = await self._extract_metadata(file_path, file_id)
+        pcm = await self._decode_pcm(file_path, f"{file_id}_verify", metadata)
         
-        # Generate pseudo-random sequence based on file_id
-        seed = int(hashlib.md5(file_id.encode()).hexdigest()[:8], 16)
-        np.random.seed(seed)
-        
-        # Create watermark signal
-        watermark = np.random.randn(44100 * 10) * 0.01  # 10 seconds, very low amplitude
+        try:
+            seed = watermark_seed(file_id, self.config.watermark_key.get_secret_value())
+            loop = asyncio.get_running_loop()
+            score = await loop.run_in_executor(self.analysis_executor, detect_watermark, pcm, seed)
+        finally:
+            pcm.close()
+            await self._cleanup_temp_files(pcm.path)
         
-        return watermark
+        return {"score": score, "detected": score >= self.config.watermark_threshold}
     
-    async def _calculate_loudness(self, file_path: str) -> float:
-        """Calculate integrated loudness using EBU R128"""
-        try:
-            # Use ffmpeg to calculate loudness
-            cmd = [
-                'ffmpeg', '-i', file_path, '-af', 'loudnorm=I=-16:TP=-1.5:LRA=11:print_format=json',
-                '-f', 'null', '-'
-            ]
-            
-            # This is a simplified implementation
-            # In production, use proper loudness measurement
-            return -20.0  # Placeholder value
-            
-        except Exception as e:
-            logger.error(f"Error calculating loudness: {str(e)}")
-            return None
+    async def _calculate_loudness(self, pcm: PCMBuffer) -> Dict[str, Optional[float]]:
+        """Measure EBU R128 integrated loudness, loudness range and true peak"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.analysis_executor, measure_loudness, pcm)
     
-    async def _detect_bpm(self, file_path: str) -> float:
-        """Detect BPM using audio analysis"""
-        try:
-            # Simplified BPM detection
-            # In production, use librosa or other audio analysis libraries
-            return 120.0  # Placeholder value
-            
-        except Exception as e:
-            logger.error(f"Error detecting BPM: {str(e)}")
-            return None
+    async def _detect_bpm(self, pcm: PCMBuffer) -> Optional[float]:
+        """Detect BPM from the onset envelope of the reduced-rate mono"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.analysis_executor, detect_bpm, pcm)
     
-    async def _detect_key(self, file_path: str) -> str:
-        """Detect musical key"""
-        try:
-            # Simplified key detection
-            # In production, use proper music theory analysis
-            keys = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-            return np.random.choice(keys)  # Placeholder
-            
-        except Exception as e:
-            logger.error(f"Error detecting key: {str(e)}")
-            return None
+    async def _detect_key(self, pcm: PCMBuffer) -> Optional[str]:
+        """Detect musical key from the chroma of the reduced-rate mono"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.analysis_executor, detect_key, pcm)
     
     async def _upload_to_s3(self, file_paths: List[str], file_id: str) -> List[Dict]:
-        """Upload processed files to S3"""
-        upload_results = []
-        
-        for file_path in file_paths:
+        """Upload processed files to S3 concurrently"""
+        async def upload(file_path: str) -> Optional[Dict]:
             try:
                 format_type = os.path.basename(file_path).split('_')[-1]
                 s3_key = f"processed/{file_id}/{format_type}/{os.path.basename(file_path)}"
                 
-                self.s3_client.upload_file(
-                    file_path,
-                    self.config.output_bucket,
-                    s3_key
-                )
+                size = await self._upload_file(file_path, s3_key, file_id)
                 
-                upload_results.append({
+                return {
                     "format": format_type,
                     "s3_key": s3_key,
-                    "size": os.path.getsize(file_path)
-                })
+                    "size": size
+                }
                 
             except Exception as e:
                 logger.error(f"Error uploading {file_path}: {str(e)}")
-                continue
+                return None
+        
+        results = await asyncio.gather(*(upload(file_path) for file_path in file_paths))
+        return [result for result in results if result is not None]
+    
+    async def _upload_artifacts(self, artifacts: List[Tuple[str, str]], file_id: str) -> List[str]:
+        """Upload visualizations and other derived files to S3 concurrently, returning uploaded keys"""
+        async def upload(file_path: str, s3_key: str) -> Optional[str]:
+            try:
+                await self._upload_file(file_path, s3_key, file_id)
+                return s3_key
+            except Exception as e:
+                logger.error(f"Error uploading {file_path}: {str(e)}")
+                return None
+        
+        results = await asyncio.gather(*(upload(file_path, s3_key) for file_path, s3_key in artifacts))
+        return [s3_key for s3_key in results if s3_key is not None]
+    
+    async def _hash_file(self, file_path: str) -> str:
+        """SHA-256 of a local file, read in fixed-size chunks off the event loop"""
+        def digest() -> str:
+            content_hash = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(functools.partial(f.read, HASH_CHUNK_BYTES), b''):
+                    content_hash.update(chunk)
+            return content_hash.hexdigest()
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, digest)
+    
+    async def _reuse_processed(self, file_id: str, content_hash: str, filename: str,
+                               local_path: Optional[str] = None, pcm: Optional[PCMBuffer] = None) -> Optional[Dict]:
+        """Copy outputs of an already processed identical master, or return None on a miss"""
+        try:
+            record = await self.metadata_store.get_record(f"content_hash:{content_hash}")
+        except Exception as e:
+            logger.error(f"Error reading dedup cache: {str(e)}")
+            record = None
+        
+        if not record or record["file_id"] == file_id:
+            await self._count_dedup("misses")
+            return None
+        
+        source_id = record["file_id"]
+        logger.info(f"Content hash {content_hash} matches {source_id}, copying outputs for {file_id}")
+        
+        try:
+            # Server-side copies; nothing is re-encoded or re-uploaded
+            processed_files = [
+                {**entry, "s3_key": rekey(entry["s3_key"], source_id, file_id)}
+                for entry in record["processed_files"]
+            ]
+            copies = [
+                (entry["s3_key"], target["s3_key"])
+                for entry, target in zip(record["processed_files"], processed_files)
+            ]
+            # Watermarks are seeded from the file_id, so the source's would not verify under this one
+            copies += [
+                (s3_key, rekey(s3_key, source_id, file_id))
+                for s3_key in record["artifacts"] if not s3_key.startswith("watermarked/")
+            ]
+            await asyncio.gather(*(self._copy_object(source, target, file_id) for source, target in copies))
+        except Exception as e:
+            # Source outputs are gone or unreadable; drop the stale entry and process normally
+            logger.warning(f"Dedup copy from {source_id} failed, processing {file_id} from scratch: {str(e)}")
+            await self.metadata_store.delete(f"content_hash:{content_hash}")
+            await self._count_dedup("misses")
+            return None
+        
+        # Clone metadata under the new file_id
+        metadata = AudioMetadata(**{**record["metadata"], "file_id": file_id, "original_filename": filename})
+        
+        if self.config.watermark_enabled:
+            await self._rewatermark(file_id, metadata, local_path, pcm)
+        
+        self.metadata_store.update_status(file_id, "completed", error=None, deduplicated_from=source_id)
+        await self._update_metadata(file_id, metadata)
+        await self._count_dedup("hits")
+        
+        return {
+            "file_id": file_id,
+            "status": "completed",
+            "processed_files": processed_files,
+            "metadata": metadata.dict(),
+            "transfers": self.transfer_metrics.pop(file_id, []),
+            "deduplicated_from": source_id
+        }
+    
+    async def _rewatermark(self, file_id: str, metadata: AudioMetadata, local_path: Optional[str],
+                           pcm: Optional[PCMBuffer] = None):
+        """Embed and upload file_id's own watermark for a deduplicated master, decoding it unless pcm is given"""
+        decoded = pcm is None
+        if decoded:
+            pcm = await self._timed(file_id, "decode", self._decode_pcm(local_path, file_id, metadata))
+        try:
+            record = await self._artifact_stage(file_id, "watermark", self._add_watermark(pcm, file_id))
+            if not record["complete"]:
+                logger.error(f"Watermark for deduplicated {file_id} was not produced")
+        finally:
+            # A caller's PCM is released by the caller
+            if decoded:
+                pcm.close()
+                await self._cleanup_temp_files(pcm.path)
+    
+    async def _register_processed(self, metadata: AudioMetadata, upload_results: List[Dict], artifact_keys: List[str]):
+        """Record where the outputs for a content hash live"""
+        try:
+            record = {
+                "file_id": metadata.file_id,
+                "processed_files": upload_results,
+                "artifacts": artifact_keys,
+                "metadata": metadata.dict()
+            }
+            await self.metadata_store.set_record(
+                f"content_hash:{metadata.content_hash}",
+                record,
+                self.config.dedup_ttl_seconds
+            )
+        except Exception as e:
+            logger.error(f"Error updating dedup cache: {str(e)}")
+    
+    async def _copy_object(self, source_key: str, target_key: str, file_id: str):
+        """Server-side copy within the output bucket"""
+        async with self.transfer_semaphore:
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    self.s3_client.copy,
+                    {'Bucket': self.config.output_bucket, 'Key': source_key},
+                    self.config.output_bucket,
+                    target_key,
+                    Config=self.transfer_config
+                )
+            )
         
-        return upload_results
+        self._record_transfer(file_id, "copy", target_key, 0, time.perf_counter() - start)
+    
+    async def _count_dedup(self, outcome: str):
+        """Bump local and cluster-wide dedup hit/miss counters"""
+        self.dedup_stats[outcome] += 1
+        try:
+            await self.metadata_store.incr(f"dedup_cache:{outcome}")
+        except Exception as e:
+            logger.error(f"Error updating dedup counters: {str(e)}")
+    
+    async def get_dedup_stats(self) -> Dict[str, Dict[str, int]]:
+        """Dedup hit/miss counters for this processor and across all processors"""
+        try:
+            counters = await self.metadata_store.get_counters("dedup_cache:hits", "dedup_cache:misses")
+            cluster = {"hits": counters["dedup_cache:hits"], "misses": counters["dedup_cache:misses"]}
+        except Exception as e:
+            logger.error(f"Error reading dedup counters: {str(e)}")
+            cluster = {}
+        
+        return {"local": dict(self.dedup_stats), "cluster": cluster}
     
     async def _update_metadata(self, file_id: str, metadata: AudioMetadata):
         """Update metadata in Redis"""
         try:
-            self.redis_client.setex(
-                f"audio_metadata:{file_id}",
-                3600,  # 1 hour TTL
-                metadata.json()
-            )
+            # Goes out in one pipeline with any status updates still buffered for the file
+            await self.metadata_store.set_metadata(file_id, metadata.dict())
         except Exception as e:
             logger.error(f"Error updating metadata: {str(e)}")
     
     async def _update_processing_status(self, file_id: str, status: str, error: str = None):
         """Update processing status"""
         try:
-            status_data = {
-                "status": status,
-                "updated_at": time.time(),
-                "error": error
-            }
-            
-            self.redis_client.setex(
-                f"processing_status:{file_id}",
-                3600,
-                json.dumps(status_data)
-            )
+            await self.metadata_store.set_status(file_id, status, error)
         except Exception as e:
             logger.error(f"Error updating processing status: {str(e)}")
     
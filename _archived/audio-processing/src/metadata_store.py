@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+import msgpack
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no stage is running
+TERMINAL_STATUSES = ("completed", "failed", "dead")
+
+def pack(value: Any) -> bytes:
+    """Compact binary encoding for one stored value"""
+    return msgpack.packb(value, use_bin_type=True)
+
+def unpack(data: Optional[bytes]) -> Any:
+    """Decode a value written by pack"""
+    return msgpack.unpackb(data, raw=False) if data is not None else None
+
+class MetadataStore:
+    """Async Redis layer for file metadata, processing status and the dedup cache"""
+    
+    def __init__(self, redis_client: aioredis.Redis, ttl: int = 3600, flush_interval: float = 0.5):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        
+        # Status updates made while a job runs coalesce here until the next pipelined flush
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def from_url(cls, redis_url: str, **kwargs) -> "MetadataStore":
+        """Store backed by a new async client for redis_url"""
+        return cls(aioredis.from_url(redis_url), **kwargs)
+    
+    @staticmethod
+    def metadata_key(file_id: str) -> str:
+        """Hash of metadata fields, one msgpack value per field"""
+        return f"audio_metadata:{file_id}"
+    
+    @staticmethod
+    def status_key(file_id: str) -> str:
+        """Hash of processing status fields"""
+        return f"processing_status:{file_id}"
+    
+    @staticmethod
+    def checkpoint_key(file_id: str, content_hash: str) -> str:
+        """Hash of finished-stage records for one file_id and source content"""
+        return f"checkpoint:{file_id}:{content_hash}"
+    
+    def write_fields(self, pipe, key: str, fields: Dict[str, Any], ttl: Optional[int] = None):
+        """Queue a partial hash update and TTL refresh on an existing pipeline"""
+        pipe.hset(key, mapping={name: pack(value) for name, value in fields.items()})
+        pipe.expire(key, ttl or self.ttl)
+    
+    def write_status(self, pipe, file_id: str, status: str, error: Optional[str] = None, **fields):
+        """Queue a status update on an existing pipeline, e.g. inside a caller's transaction"""
+        self._write_status_fields(pipe, file_id, {
+            "status": status, "updated_at": time.time(), "error": error, **fields
+        })
+    
+    def update_status(self, file_id: str, status: str, **fields):
+        """Buffer an intermediate status update; repeated updates to a file coalesce"""
+        self.pending.setdefault(file_id, {}).update(
+            {"status": status, "updated_at": time.time(), **fields}
+        )
+        
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+    
+    async def set_status(self, file_id: str, status: str, error: Optional[str] = None, **fields):
+        """Write a status immediately, together with anything still buffered"""
+        self.pending.setdefault(file_id, {}).update(
+            {"status": status, "updated_at": time.time(), "error": error, **fields}
+        )
+        await self.flush()
+    
+    async def set_metadata(self, file_id: str, metadata: Dict[str, Any]):
+        """Write metadata fields, together with any buffered status updates"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            self.write_fields(pipe, self.metadata_key(file_id), metadata)
+            self._drain(pipe)
+            await pipe.execute()
+    
+    async def flush(self):
+        """Send all buffered status updates in one pipeline"""
+        if not self.pending:
+            return
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            self._drain(pipe)
+            await pipe.execute()
+    
+    def _drain(self, pipe):
+        """Move buffered status updates onto a pipeline"""
+        pending, self.pending = self.pending, {}
+        for file_id, fields in pending.items():
+            self._write_status_fields(pipe, file_id, fields)
+    
+    def _write_status_fields(self, pipe, file_id: str, fields: Dict[str, Any]):
+        """Queue status fields, clearing the last stage once the job reaches a terminal status"""
+        key = self.status_key(file_id)
+        if fields.get("status") in TERMINAL_STATUSES:
+            fields = {name: value for name, value in fields.items() if name != "stage"}
+            pipe.hdel(key, "stage")
+        self.write_fields(pipe, key, fields)
+    
+    async def _flush_later(self):
+        """Flush buffered updates after a short delay so bursts share one round trip"""
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing processing status: {str(e)}")
+    
+    async def get_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """All metadata fields for a file"""
+        return await self._get_fields(self.metadata_key(file_id))
+    
+    async def get_status(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Latest processing status for a file"""
+        return await self._get_fields(self.status_key(file_id))
+    
+    async def _get_fields(self, key: str) -> Optional[Dict[str, Any]]:
+        """Decode every field of a hash"""
+        fields = await self.redis_client.hgetall(key)
+        if not fields:
+            return None
+        return {name.decode(): unpack(value) for name, value in fields.items()}
+    
+    async def get_checkpoints(self, file_id: str, content_hash: str) -> Dict[str, Any]:
+        """Records of the stages an earlier attempt finished, by stage name"""
+        return await self._get_fields(self.checkpoint_key(file_id, content_hash)) or {}
+    
+    async def set_checkpoint(self, file_id: str, content_hash: str, stage: str, record: Any, ttl: int):
+        """Record a finished stage"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            self.write_fields(pipe, self.checkpoint_key(file_id, content_hash), {stage: record}, ttl)
+            await pipe.execute()
+    
+    async def get_record(self, key: str) -> Any:
+        """Read a whole msgpack-encoded record"""
+        return unpack(await self.redis_client.get(key))
+    
+    async def set_record(self, key: str, record: Any, ttl: int):
+        """Write a whole msgpack-encoded record"""
+        await self.redis_client.set(key, pack(record), ex=ttl)
+    
+    async def delete(self, *keys: str):
+        """Remove keys"""
+        await self.redis_client.delete(*keys)
+    
+    async def incr(self, key: str) -> int:
+        """Increment a counter"""
+        return await self.redis_client.incr(key)
+    
+    async def get_counters(self, *keys: str) -> Dict[str, int]:
+        """Integer values of several counters, 0 when unset"""
+        values = await self.redis_client.mget(*keys)
+        return {key: int(value or 0) for key, value in zip(keys, values)}
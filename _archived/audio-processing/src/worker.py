@@ -0,0 +1,332 @@
+import os
+import asyncio
+import logging
+import json
+import random
+import signal
+import socket
+import time
+from typing import Dict, Optional
+from pydantic import BaseModel
+from prometheus_client import start_http_server
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from audio_processor import AudioProcessor, AudioProcessingConfig
+from metadata_store import MetadataStore, pack
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class WorkerConfig(BaseModel):
+    """Configuration for the audio processing worker"""
+    redis_url: str = "redis://localhost:6379"
+    stream: str = "audio_jobs"
+    group: str = "audio_processors"
+    consumer: str = f"{socket.gethostname()}-{os.getpid()}"
+    concurrency: int = 4  # jobs in flight per worker process
+    max_retries: int = 5
+    retry_base_delay: float = 5.0  # seconds, doubled per attempt
+    retry_max_delay: float = 300.0
+    claim_idle_ms: int = 10 * 60 * 1000  # reclaim jobs whose consumer stopped heartbeating this long
+    claim_interval: float = 30.0
+    block_ms: int = 5000
+    retry_poll_interval: float = 1.0
+    metrics_port: int = 8080  # Prometheus scrape endpoint, 0 disables
+    
+    @property
+    def retry_key(self) -> str:
+        """Sorted set of jobs waiting out their backoff, scored by due time"""
+        return f"{self.stream}:retry"
+    
+    @property
+    def dead_letter_stream(self) -> str:
+        """Stream of jobs that exhausted their retries"""
+        return f"{self.stream}:dead"
+    
+    @classmethod
+    def from_env(cls) -> "WorkerConfig":
+        """Build a config from AUDIO_WORKER_* environment variables"""
+        overrides = {}
+        for name in cls.__annotations__:
+            value = os.getenv(f"AUDIO_WORKER_{name.upper()}")
+            if value is not None:
+                # Pydantic coerces the raw string to the field's type
+                overrides[name] = value
+        return cls(**overrides)
+
+# Remove a due retry, mark it queued and re-enqueue it in one step, so a crash in between can neither lose nor duplicate it
+# ARGV: payload, status TTL, status field count, status fields..., stream fields...
+REQUEUE_RETRY_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    local split = 4 + tonumber(ARGV[3])
+    redis.call('HSET', KEYS[3], unpack(ARGV, 4, split - 1))
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+    return redis.call('XADD', KEYS[2], '*', unpack(ARGV, split))
+end
+return false
+"""
+
+def processing_config_from_env(redis_url: str) -> AudioProcessingConfig:
+    """Build the processor config from AUDIO_* environment variables"""
+    return AudioProcessingConfig(
+        input_bucket=os.environ["AUDIO_INPUT_BUCKET"],
+        output_bucket=os.environ["AUDIO_OUTPUT_BUCKET"],
+        temp_dir=os.getenv("AUDIO_TEMP_DIR", "/tmp/audio_processing"),
+        redis_url=redis_url,
+        # Unset variables keep the config defaults; pydantic coerces the raw strings
+        **{
+            name: os.environ[f"AUDIO_{name.upper()}"]
+            for name in ("streaming_ingest", "dedup_enabled", "checkpoints_enabled", "analysis_executor", "analysis_workers")
+            if f"AUDIO_{name.upper()}" in os.environ
+        }
+    )
+
+def retry_delay(attempt: int, config: WorkerConfig) -> float:
+    """Exponential backoff with full jitter for the given attempt number (1-based)"""
+    ceiling = min(config.retry_max_delay, config.retry_base_delay * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+async def enqueue_job(redis_client: aioredis.Redis, file_id: str, s3_key: str, stream: str = "audio_jobs", attempt: int = 0) -> str:
+    """Add a processing job to the stream, returning its message id"""
+    job = {
+        "file_id": file_id,
+        "s3_key": s3_key,
+        "attempt": str(attempt),
+        "enqueued_at": str(time.time())
+    }
+    
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xadd(stream, job)
+        MetadataStore(redis_client).write_status(pipe, file_id, "queued")
+        message_id, *_ = await pipe.execute()
+    
+    return message_id.decode() if isinstance(message_id, bytes) else message_id
+
+class AudioWorker:
+    """Consumer-group worker feeding stream jobs into an AudioProcessor"""
+    
+    def __init__(self, config: WorkerConfig, processor: AudioProcessor, redis_client: Optional[aioredis.Redis] = None):
+        self.config = config
+        self.processor = processor
+        self.redis_client = redis_client or aioredis.from_url(config.redis_url)
+        self.metadata_store = MetadataStore(self.redis_client)
+        self.requeue_retry = self.redis_client.register_script(REQUEUE_RETRY_SCRIPT)
+        self.slots = asyncio.Semaphore(config.concurrency)
+        self.in_flight: set = set()
+        self.stopping = asyncio.Event()
+    
+    async def run(self):
+        """Consume jobs until stop() is called, then drain in-flight work"""
+        await self._ensure_group()
+        logger.info(f"Worker {self.config.consumer} consuming {self.config.stream} with concurrency {self.config.concurrency}")
+        
+        loops = [
+            asyncio.create_task(self._consume_loop()),
+            asyncio.create_task(self._reclaim_loop()),
+            asyncio.create_task(self._retry_loop())
+        ]
+        
+        await self.stopping.wait()
+        for task in loops:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+        
+        # Let running jobs finish; anything unacked is reclaimed by another worker
+        if self.in_flight:
+            logger.info(f"Waiting for {len(self.in_flight)} in-flight jobs")
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+    
+    def stop(self):
+        """Stop taking new jobs"""
+        self.stopping.set()
+    
+    async def _ensure_group(self):
+        """Create the stream and consumer group if they do not exist yet"""
+        try:
+            await self.redis_client.xgroup_create(self.config.stream, self.config.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def _consume_loop(self):
+        """Read new messages for this consumer whenever a concurrency slot is free"""
+        while not self.stopping.is_set():
+            await self.slots.acquire()
+            free = 1
+            
+            # Take every free slot at once so one read can fill the worker
+            while free < self.config.concurrency and not self.slots.locked():
+                await self.slots.acquire()
+                free += 1
+            
+            try:
+                response = await self.redis_client.xreadgroup(
+                    self.config.group,
+                    self.config.consumer,
+                    {self.config.stream: ">"},
+                    count=free,
+                    block=self.config.block_ms
+                )
+            except Exception as e:
+                logger.error(f"Error reading from {self.config.stream}: {str(e)}")
+                response = []
+                await asyncio.sleep(1)
+            
+            messages = [message for _, entries in response for message in entries]
+            for message in messages:
+                self._dispatch(*message)
+            
+            # Hand back slots the read did not fill
+            for _ in range(free - len(messages)):
+                self.slots.release()
+    
+    async def _reclaim_loop(self):
+        """Fail over jobs left pending by consumers that died mid-processing"""
+        while not self.stopping.is_set():
+            await asyncio.sleep(self.config.claim_interval)
+            
+            try:
+                start = "0-0"
+                while True:
+                    result = await self.redis_client.xautoclaim(
+                        self.config.stream,
+                        self.config.group,
+                        self.config.consumer,
+                        min_idle_time=self.config.claim_idle_ms,
+                        start_id=start,
+                        count=100
+                    )
+                    start, messages = result[0], result[1]
+                    
+                    # Count the lost delivery as a failed attempt so poison jobs end up dead-lettered
+                    for message_id, fields in messages:
+                        message_id = self._decode(message_id)
+                        if not fields:
+                            # Entry was trimmed from the stream; nothing left to run
+                            await self.redis_client.xack(self.config.stream, self.config.group, message_id)
+                            continue
+                        
+                        logger.warning(f"Reclaimed job {message_id} from an unresponsive consumer")
+                        error = RuntimeError("consumer stopped responding")
+                        await self._fail(message_id, self._decode_fields(fields), error)
+                    
+                    if self._decode(start) == "0-0":
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reclaiming pending jobs: {str(e)}")
+    
+    async def _retry_loop(self):
+        """Move jobs whose backoff has elapsed from the retry set back onto the stream"""
+        while not self.stopping.is_set():
+            try:
+                due = await self.redis_client.zrangebyscore(self.config.retry_key, 0, time.time(), start=0, num=100)
+                for payload in due:
+                    # Only the worker that removes the entry re-enqueues it
+                    job = json.loads(payload)
+                    fields = [item for pair in job.items() for item in pair]
+                    status = [item for pair in self._queued_status(job).items() for item in pair]
+                    await self.requeue_retry(
+                        keys=[self.config.retry_key, self.config.stream, self.metadata_store.status_key(job["file_id"])],
+                        args=[payload, self.metadata_store.ttl, len(status), *status, *fields]
+                    )
+            except Exception as e:
+                logger.error(f"Error scheduling retries: {str(e)}")
+            
+            await asyncio.sleep(self.config.retry_poll_interval)
+    
+    def _dispatch(self, message_id, fields: Dict):
+        """Run one job as a task holding an already acquired slot"""
+        task = asyncio.create_task(self._handle(self._decode(message_id), self._decode_fields(fields)))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+    
+    async def _handle(self, message_id: str, job: Dict[str, str]):
+        """Process a job and acknowledge it, scheduling a retry or dead-lettering on failure"""
+        heartbeat = asyncio.create_task(self._heartbeat(message_id))
+        try:
+            logger.info(f"Processing job {message_id} for file_id {job['file_id']}")
+            await self.processor.process_audio_file(job["file_id"], job["s3_key"])
+            await self.redis_client.xack(self.config.stream, self.config.group, message_id)
+            
+        except Exception as e:
+            await self._fail(message_id, job, e)
+            
+        finally:
+            heartbeat.cancel()
+            self.slots.release()
+    
+    async def _heartbeat(self, message_id: str):
+        """Keep resetting the pending entry's idle time so long jobs are not reclaimed"""
+        while True:
+            await asyncio.sleep(self.config.claim_idle_ms / 3000)
+            try:
+                await self.redis_client.xclaim(
+                    self.config.stream,
+                    self.config.group,
+                    self.config.consumer,
+                    min_idle_time=0,
+                    message_ids=[message_id],
+                    justid=True
+                )
+            except Exception as e:
+                logger.error(f"Error extending claim on job {message_id}: {str(e)}")
+    
+    async def _fail(self, message_id: str, job: Dict[str, str], error: Exception):
+        """Schedule a backoff retry or move the job to the dead-letter stream"""
+        attempt = int(job.get("attempt", 0)) + 1
+        job = {**job, "attempt": str(attempt), "error": str(error)}
+        file_id = job["file_id"]
+        
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                if attempt > self.config.max_retries:
+                    logger.error(f"Job {message_id} for {file_id} failed {attempt} times, dead-lettering: {str(error)}")
+                    pipe.xadd(self.config.dead_letter_stream, {**job, "failed_at": str(time.time())})
+                    self.metadata_store.write_status(pipe, file_id, "dead", str(error), attempt=attempt)
+                else:
+                    delay = retry_delay(attempt, self.config)
+                    logger.warning(f"Job {message_id} for {file_id} failed (attempt {attempt}), retrying in {delay:.1f}s: {str(error)}")
+                    pipe.zadd(self.config.retry_key, {json.dumps(job, sort_keys=True): time.time() + delay})
+                    self.metadata_store.write_status(pipe, file_id, "retrying", str(error), attempt=attempt)
+                
+                # Acknowledge in the same transaction so the job is never lost or duplicated
+                pipe.xack(self.config.stream, self.config.group, message_id)
+                await pipe.execute()
+        except Exception as e:
+            # Left pending; another worker reclaims it after claim_idle_ms
+            logger.error(f"Error recording failure for job {message_id}: {str(e)}")
+    
+    @staticmethod
+    def _queued_status(job: Dict[str, str]) -> Dict[str, bytes]:
+        """Packed status fields for a retry going back onto the stream"""
+        fields = {"status": "queued", "updated_at": time.time(), "error": None, "attempt": int(job.get("attempt", 0))}
+        return {name: pack(value) for name, value in fields.items()}
+    
+    @staticmethod
+    def _decode(value) -> str:
+        """Text form of a Redis reply value"""
+        return value.decode() if isinstance(value, bytes) else value
+    
+    def _decode_fields(self, fields: Dict) -> Dict[str, str]:
+        """Text form of a stream entry's fields"""
+        return {self._decode(key): self._decode(value) for key, value in fields.items()}
+
+async def main():
+    config = WorkerConfig.from_env()
+    if config.metrics_port:
+        start_http_server(config.metrics_port)
+    
+    worker = AudioWorker(config, AudioProcessor(processing_config_from_env(config.redis_url)))
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    
+    await worker.run()
+
+if __name__ == "__main__":
+    asyncio.run(main())
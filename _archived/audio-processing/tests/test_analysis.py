@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from audio_processor import PCMBuffer, detect_bpm, detect_key
+
+SR = 44100
+
+def pcm_buffer(tmp_path, mono: np.ndarray) -> PCMBuffer:
+    """Stereo f32le PCMBuffer holding the same signal in both channels"""
+    path = str(tmp_path / "pcm.f32")
+    np.repeat(mono.astype(np.float32), 2).tofile(path)
+    return PCMBuffer(path, SR, 2)
+
+def click_track(bpm: float, seconds: float = 30.0) -> np.ndarray:
+    """Short decaying noise bursts on every beat"""
+    rng = np.random.default_rng(0)
+    audio = np.zeros(int(seconds * SR))
+    burst = rng.uniform(-1, 1, int(0.02 * SR)) * np.exp(-np.linspace(0, 8, int(0.02 * SR)))
+    for beat in np.arange(0, seconds, 60 / bpm):
+        start = int(beat * SR)
+        audio[start:start + len(burst)] += burst[:len(audio) - start]
+    return 0.5 * audio
+
+def triad(root_midi: int, minor: bool, seconds: float = 10.0) -> np.ndarray:
+    """Root position triad with a few harmonics per note"""
+    t = np.arange(int(seconds * SR)) / SR
+    audio = np.zeros_like(t)
+    for interval in (0, 3 if minor else 4, 7):
+        f0 = 440.0 * 2 ** ((root_midi + interval - 69) / 12)
+        for harmonic in range(1, 4):
+            audio += np.sin(2 * np.pi * f0 * harmonic * t) / harmonic
+    return 0.1 * audio
+
+def test_click_track_tempo(tmp_path):
+    assert detect_bpm(pcm_buffer(tmp_path, click_track(128.0))) == pytest.approx(128.0, abs=1.0)
+
+@pytest.mark.parametrize("root_midi, minor, expected", [
+    (60, False, "C major"),
+    (67, False, "G major"),
+    (57, True, "A minor"),
+    (62, True, "D minor"),
+])
+def test_triad_key(tmp_path, root_midi, minor, expected):
+    assert detect_key(pcm_buffer(tmp_path, triad(root_midi, minor))) == expected
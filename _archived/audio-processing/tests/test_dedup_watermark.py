@@ -0,0 +1,81 @@
+import sys
+import asyncio
+import shutil
+import wave
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+moto = pytest.importorskip("moto")
+fakeredis = pytest.importorskip("fakeredis")
+
+import boto3
+from audio_processor import AudioProcessingConfig, AudioProcessor
+from metadata_store import MetadataStore
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="requires ffmpeg and ffprobe on PATH"
+)
+
+def write_master(path: str, seconds: float = 30.0, sample_rate: int = 44100):
+    """Stereo 16-bit WAV of a chord over light noise"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    rng = np.random.default_rng(0)
+    tone = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 277.2, 329.6)) / 3
+    audio = np.stack([tone, np.roll(tone, 100)], axis=1) * 0.4 + rng.normal(0, 0.02, (len(t), 2))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    
+    with moto.mock_aws():
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket="input")
+        s3_client.create_bucket(Bucket="output")
+        
+        config = AudioProcessingConfig(
+            input_bucket="input",
+            output_bucket="output",
+            temp_dir=str(tmp_path / "work"),
+            watermark_key="test-key",
+            waveform_enabled=False,
+            spectrogram_enabled=False,
+            checkpoints_enabled=False
+        )
+        processor = AudioProcessor(config)
+        processor.s3_client = s3_client
+        processor.metadata_store = MetadataStore(fakeredis.FakeAsyncRedis())
+        yield processor
+
+def test_deduplicated_file_carries_its_own_watermark(processor, tmp_path):
+    master = str(tmp_path / "master.wav")
+    write_master(master)
+    processor.s3_client.upload_file(master, "input", "masters/a.wav")
+    processor.s3_client.upload_file(master, "input", "masters/b.wav")
+    
+    async def run():
+        await processor.process_audio_file("track-a", "masters/a.wav")
+        result = await processor.process_audio_file("track-b", "masters/b.wav")
+        
+        marked = str(tmp_path / "track-b.flac")
+        processor.s3_client.download_file("output", "watermarked/track-b.flac", marked)
+        return (
+            result,
+            await processor.verify_watermark(marked, "track-b"),
+            await processor.verify_watermark(marked, "track-a")
+        )
+    
+    result, own, source = asyncio.run(run())
+    
+    assert result["deduplicated_from"] == "track-a"
+    assert own["detected"]
+    assert not source["detected"]
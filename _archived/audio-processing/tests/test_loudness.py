@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from audio_processor import LoudnessMeter
+
+SR = 48000
+
+def sine(frequency: float, dbfs: float, seconds: float = 10.0, phase: float = 0.0) -> np.ndarray:
+    """Stereo sine with peak amplitude at dbfs"""
+    t = np.arange(int(seconds * SR)) / SR
+    tone = 10 ** (dbfs / 20) * np.sin(2 * np.pi * frequency * t + phase)
+    return np.stack([tone, tone], axis=1)
+
+def meter_for(frames: np.ndarray, chunk_frames: int = 65536) -> LoudnessMeter:
+    """Meter fed frames in chunks, as measure_loudness does"""
+    meter = LoudnessMeter(SR, frames.shape[1])
+    for start in range(0, len(frames), chunk_frames):
+        meter.update(frames[start:start + chunk_frames])
+    return meter
+
+def test_stereo_sine_at_minus_20_dbfs_reads_minus_20_lufs():
+    meter = meter_for(sine(1000.0, -20.0))
+    
+    assert meter.integrated == pytest.approx(-20.0, abs=0.1)
+
+def test_silence_is_gated_out():
+    silence = np.zeros((10 * SR, 2))
+    meter = meter_for(silence)
+    
+    assert meter.integrated is None
+    assert meter.loudness_range is None
+    assert meter.true_peak is None
+    
+    # Silence after the tone falls below the absolute gate and does not pull the level down
+    meter = meter_for(np.concatenate([sine(1000.0, -20.0), silence]))
+    assert meter.integrated == pytest.approx(-20.0, abs=0.1)
+
+def test_true_peak_finds_inter_sample_peak():
+    # At fs/4 with a 45 degree offset every sample lands at 1/sqrt(2) of the real peak
+    frames = sine(SR / 4, -6.0, seconds=1.0, phase=np.pi / 4)
+    meter = meter_for(frames)
+    sample_peak_db = 20 * np.log10(np.abs(frames).max())
+    
+    assert meter.true_peak - sample_peak_db == pytest.approx(3.01, abs=0.1)
+    assert meter.true_peak == pytest.approx(-6.0, abs=0.1)
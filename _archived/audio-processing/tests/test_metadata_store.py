@@ -0,0 +1,42 @@
+import sys
+import asyncio
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from metadata_store import MetadataStore
+
+@pytest.mark.parametrize("terminal", ["completed", "failed"])
+def test_terminal_status_clears_stage(terminal):
+    store = MetadataStore(fakeredis.FakeAsyncRedis())
+    
+    async def run():
+        store.update_status("f1", "processing", stage="probe")
+        await store.flush()
+        store.update_status("f1", "processing", stage="transcode")
+        await store.set_status("f1", terminal)
+        return await store.get_status("f1")
+    
+    status = asyncio.run(run())
+    
+    assert status["status"] == terminal
+    assert "stage" not in status
+
+def test_dead_letter_status_clears_stage():
+    store = MetadataStore(fakeredis.FakeAsyncRedis())
+    
+    async def run():
+        await store.set_status("f1", "processing", stage="analysis")
+        async with store.redis_client.pipeline(transaction=True) as pipe:
+            store.write_status(pipe, "f1", "dead", "boom", attempt=6)
+            await pipe.execute()
+        return await store.get_status("f1")
+    
+    status = asyncio.run(run())
+    
+    assert status["status"] == "dead"
+    assert status["attempt"] == 6
+    assert "stage" not in status
@@ -0,0 +1,66 @@
+import sys
+import asyncio
+import json
+import time
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from metadata_store import MetadataStore
+from worker import AudioWorker, WorkerConfig, processing_config_from_env
+
+def test_config_from_env_coerces_strings(monkeypatch):
+    monkeypatch.setenv("AUDIO_WORKER_CONCURRENCY", "8")
+    monkeypatch.setenv("AUDIO_WORKER_RETRY_BASE_DELAY", "2.5")
+    monkeypatch.setenv("AUDIO_WORKER_STREAM", "jobs")
+    
+    config = WorkerConfig.from_env()
+    
+    assert config.concurrency == 8
+    assert config.retry_base_delay == 2.5
+    assert config.stream == "jobs"
+    assert config.retry_key == "jobs:retry"
+
+def test_processing_config_from_env_reads_feature_flags(monkeypatch):
+    monkeypatch.setenv("AUDIO_INPUT_BUCKET", "in")
+    monkeypatch.setenv("AUDIO_OUTPUT_BUCKET", "out")
+    monkeypatch.setenv("AUDIO_STREAMING_INGEST", "true")
+    monkeypatch.setenv("AUDIO_DEDUP_ENABLED", "0")
+    monkeypatch.setenv("AUDIO_ANALYSIS_EXECUTOR", "process")
+    monkeypatch.setenv("AUDIO_ANALYSIS_WORKERS", "3")
+    
+    config = processing_config_from_env("redis://redis:6379")
+    
+    assert config.streaming_ingest is True
+    assert config.dedup_enabled is False
+    assert config.checkpoints_enabled is True
+    assert config.analysis_executor == "process"
+    assert config.analysis_workers == 3
+
+def test_due_retry_is_requeued_once():
+    config = WorkerConfig(retry_poll_interval=0.01, metrics_port=0)
+    redis_client = fakeredis.FakeAsyncRedis()
+    workers = [AudioWorker(config, processor=None, redis_client=redis_client) for _ in range(2)]
+    job = {"file_id": "f1", "s3_key": "masters/f1.wav", "attempt": "1"}
+    
+    async def run():
+        await redis_client.zadd(config.retry_key, {json.dumps(job, sort_keys=True): time.time() - 1})
+        loops = [asyncio.create_task(worker._retry_loop()) for worker in workers]
+        await asyncio.sleep(0.1)
+        for worker in workers:
+            worker.stop()
+        await asyncio.gather(*loops)
+        status = await MetadataStore(redis_client).get_status("f1")
+        return await redis_client.xrange(config.stream), await redis_client.zcard(config.retry_key), status
+    
+    entries, remaining, status = asyncio.run(run())
+    
+    assert remaining == 0
+    assert status["status"] == "queued"
+    assert status["attempt"] == 1
+    assert len(entries) == 1
+    assert {key.decode(): value.decode() for key, value in entries[0][1].items()} == job
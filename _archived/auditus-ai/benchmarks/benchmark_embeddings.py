@@ -0,0 +1,117 @@
+import os
+import sys
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from auditus_intelligence import AuditusConfig, AuditusIntelligence, mel_windows
+
+# Mel frames per second at librosa's default sr=22050, hop_length=512
+FRAMES_PER_SECOND = 22050 / 512
+
+def synthesize_mel(seconds: float, n_mels: int = 128, seed: int = 0) -> np.ndarray:
+    """Deterministic dB mel spectrogram in the [-80, 0] range power_to_db(ref=np.max) produces"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-80.0, 0.0, (n_mels, int(seconds * FRAMES_PER_SECOND))).astype(np.float32)
+
+async def embed_tracks(intelligence: AuditusIntelligence, mels: List[np.ndarray]) -> List[np.ndarray]:
+    """Embed several tracks concurrently, as overlapping analyses would"""
+    vectors = await asyncio.gather(*[intelligence._create_features_vector({'mel': mel}) for mel in mels])
+    
+    # _create_features_vector falls back to zeros on error, which would otherwise time as a fast run
+    if not all(np.any(vector) for vector in vectors):
+        raise RuntimeError("embedding returned an all-zero vector")
+    return vectors
+
+def benchmark_config(seconds: int, tracks: int, batch_size: int, threads: int,
+                     window_frames: int, repeat: int) -> Dict[str, float]:
+    """Windows per second through the batched embedding path for one configuration"""
+    config = AuditusConfig(
+        device="cpu",
+        analysis_workers=1,
+        embedding_batch_size=batch_size,
+        inference_threads=threads,
+        embedding_window_frames=window_frames
+    )
+    intelligence = AuditusIntelligence(config)
+    mels = [synthesize_mel(seconds, seed=seed) for seed in range(tracks)]
+    windows = sum(len(mel_windows(mel, window_frames)) for mel in mels)
+    
+    async def run() -> float:
+        # Warm up so lazy allocations and the batcher task are not timed
+        await embed_tracks(intelligence, mels[:1])
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await embed_tracks(intelligence, mels)
+            timings.append(time.perf_counter() - start)
+        intelligence.classifier_batcher.close()
+        intelligence.embedding_batcher.close()
+        return statistics.median(timings)
+    
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        intelligence.analysis_pool.shutdown()
+        intelligence.executor.shutdown()
+        intelligence.inference_executor.shutdown()
+    
+    return {
+        "seconds": elapsed,
+        "windows": windows,
+        "windows_per_s": windows / elapsed if elapsed > 0 else float("inf"),
+        "realtime_factor": seconds * tracks / elapsed if elapsed > 0 else float("inf")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark CNN mel-window embedding throughput on CPU with synthetic spectrograms"
+    )
+    parser.add_argument("--durations", nargs="+", type=int, default=[180], help="track lengths in seconds")
+    parser.add_argument("--tracks", nargs="+", type=int, default=[1, 4], help="tracks embedded concurrently")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, os.cpu_count() or 1}),
+                        help="torch intra-op threads")
+    parser.add_argument("--window-frames", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration; the median is reported")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("auditus_intelligence").setLevel(logging.WARNING)
+    
+    results = {}
+    for seconds in args.durations:
+        for tracks in args.tracks:
+            for threads in args.threads:
+                for batch_size in args.batch_sizes:
+                    key = f"{seconds}s_x{tracks}/threads_{threads}/batch_{batch_size}"
+                    result = benchmark_config(seconds, tracks, batch_size, threads, args.window_frames, args.repeat)
+                    print(f"{key:<40} {result['windows']:>6} windows {result['seconds']:>8.3f}s "
+                          f"{result['windows_per_s']:>9.1f} windows/s {result['realtime_factor']:>8.1f}x")
+                    results[key] = result
+    
+    report = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "window_frames": args.window_frames,
+        "results": results
+    }
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
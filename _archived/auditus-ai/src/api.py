@@ -1,8 +1,9 @@
 import os
 import asyncio
+import functools
 import logging
 from typing import Dict, List, Optional, Any
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
@@ -16,7 +17,7 @@ from datetime import datetime
 import numpy as np
 from pathlib import Path
 
-from auditus_intelligence import AuditusIntelligence, AuditusConfig, MusicFeatures, MusicRecommendation
+from auditus_intelligence import AuditusIntelligence, AuditusConfig, AnalysisAdmission, AnalysisQueueFull, MusicFeatures, MusicRecommendation
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -111,10 +112,13 @@ class HealthResponse(BaseModel):
 async def health_check():
     """Health check endpoint"""
     try:
+        # Both clients are blocking, so probe them on the I/O threads
+        loop = asyncio.get_running_loop()
+        
         # Check Redis connection
         redis_connected = False
         try:
-            auditus.redis_client.ping()
+            await loop.run_in_executor(auditus.executor, auditus.redis_client.ping)
             redis_connected = True
         except:
             pass
@@ -122,7 +126,10 @@ async def health_check():
         # Check S3 connection
         s3_connected = False
         try:
-            auditus.s3_client.head_bucket(Bucket=config.s3_bucket)
+            await loop.run_in_executor(
+                auditus.executor,
+                functools.partial(auditus.s3_client.head_bucket, Bucket=config.s3_bucket)
+            )
             s3_connected = True
         except:
             pass
@@ -147,32 +154,37 @@ async def health_check():
 
 # Music analysis endpoint
 @app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_music(request: AnalysisRequest, background_tasks: BackgroundTasks):
+async def analyze_music(request: AnalysisRequest):
     """Analyze music and extract features"""
     start_time = datetime.now()
     
     try:
         logger.info(f"Starting analysis for file_id: {request.file_id}")
         
-        # Determine audio file path
+        # Claim a slot before fetching anything, so a saturated server rejects the request without downloading it
+        admission = auditus.admit_analysis()
         audio_path = None
-        if request.local_path:
-            audio_path = request.local_path
-        elif request.s3_key:
-            # Download from S3
-            audio_path = await _download_from_s3(request.s3_key, request.file_id)
-        elif request.audio_url:
-            # Download from URL
-            audio_path = await _download_from_url(request.audio_url, request.file_id)
-        else:
-            raise HTTPException(status_code=400, detail="Must provide audio_url, s3_key, or local_path")
-        
-        # Analyze music
-        features = await auditus.analyze_music(audio_path, request.file_id)
-        
-        # Cleanup temporary files
-        if request.s3_key or request.audio_url:
-            background_tasks.add_task(_cleanup_temp_file, audio_path)
+        try:
+            # Determine audio file path
+            if request.local_path:
+                audio_path = request.local_path
+            elif request.s3_key:
+                # Download from S3
+                audio_path = await _download_from_s3(request.s3_key, request.file_id)
+            elif request.audio_url:
+                # Download from URL
+                audio_path = await _download_from_url(request.audio_url, request.file_id)
+            else:
+                raise HTTPException(status_code=400, detail="Must provide audio_url, s3_key, or local_path")
+            
+            # Analyze music
+            features = await auditus.analyze_music(audio_path, request.file_id, admission)
+        finally:
+            admission.release()
+            
+            # Cleanup temporary files here; background tasks are dropped when the handler raises
+            if audio_path and (request.s3_key or request.audio_url):
+                await _cleanup_temp_file(audio_path)
         
         processing_time = (datetime.now() - start_time).total_seconds()
         
@@ -183,6 +195,14 @@ async def analyze_music(request: AnalysisRequest, background_tasks: BackgroundTa
             processing_time=processing_time
         )
         
+    except AnalysisQueueFull as e:
+        logger.warning(f"Rejected analysis for {request.file_id}: {str(e)}")
+        raise _capacity_exhausted()
+        
+    except asyncio.TimeoutError:
+        logger.error(f"Analysis timed out for {request.file_id}")
+        raise HTTPException(status_code=504, detail=f"Analysis exceeded {auditus.config.analysis_timeout}s")
+        
     except Exception as e:
         logger.error(f"Analysis failed for {request.file_id}: {str(e)}")
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -236,14 +256,25 @@ async def batch_analyze(request: BatchAnalysisRequest):
     try:
         logger.info(f"Starting batch analysis: {batch_id} with {len(request.files)} files")
         
+        # Claim a slot per file before any download starts; without one for every file the batch is rejected
+        admissions = []
+        try:
+            for _ in request.files:
+                admissions.append(auditus.admit_analysis())
+        except AnalysisQueueFull as e:
+            for admission in admissions:
+                admission.release()
+            logger.warning(f"Rejected batch {batch_id}: {str(e)}")
+            raise _capacity_exhausted()
+        
         results = []
         completed_files = 0
         failed_files = 0
         
         # Process files concurrently
         tasks = []
-        for file_request in request.files:
-            task = asyncio.create_task(_process_single_analysis(file_request))
+        for file_request, admission in zip(request.files, admissions):
+            task = asyncio.create_task(_process_single_analysis(file_request, admission))
             tasks.append(task)
         
         # Wait for all tasks to complete
@@ -274,6 +305,9 @@ async def batch_analyze(request: BatchAnalysisRequest):
             created_at=start_time
         )
         
+    except HTTPException:
+        raise
+        
     except Exception as e:
         logger.error(f"Batch analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -303,7 +337,7 @@ async def upload_audio_file(file: UploadFile = File(...)):
         )
         
         # Process analysis
-        result = await analyze_music(analysis_request, BackgroundTasks())
+        result = await analyze_music(analysis_request)
         
         return {
             "file_id": file_id,
@@ -311,6 +345,9 @@ async def upload_audio_file(file: UploadFile = File(...)):
             "analysis": result.dict()
         }
         
+    except HTTPException:
+        raise
+        
     except Exception as e:
         logger.error(f"File upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -320,12 +357,15 @@ async def upload_audio_file(file: UploadFile = File(...)):
 async def get_cache_status():
     """Get cache status and statistics"""
     try:
+        # The Redis client is blocking, so query it on the I/O threads
+        loop = asyncio.get_running_loop()
+        
         # Get Redis info
-        redis_info = auditus.redis_client.info()
+        redis_info = await loop.run_in_executor(auditus.executor, auditus.redis_client.info)
         
         # Get cache statistics
-        cache_keys = auditus.redis_client.keys("music_features:*")
-        processing_keys = auditus.redis_client.keys("processing_status:*")
+        cache_keys = await loop.run_in_executor(auditus.executor, _scan_keys, "music_features:*")
+        processing_keys = await loop.run_in_executor(auditus.executor, _scan_keys, "processing_status:*")
         
         return {
             "redis_connected": True,
@@ -343,15 +383,13 @@ async def get_cache_status():
 async def clear_cache():
     """Clear all cached data"""
     try:
+        loop = asyncio.get_running_loop()
+        
         # Clear music features cache
-        feature_keys = auditus.redis_client.keys("music_features:*")
-        if feature_keys:
-            auditus.redis_client.delete(*feature_keys)
+        feature_keys = await loop.run_in_executor(auditus.executor, _delete_keys, "music_features:*")
         
         # Clear processing status cache
-        status_keys = auditus.redis_client.keys("processing_status:*")
-        if status_keys:
-            auditus.redis_client.delete(*status_keys)
+        status_keys = await loop.run_in_executor(auditus.executor, _delete_keys, "processing_status:*")
         
         return {
             "status": "success",
@@ -386,7 +424,10 @@ async def _download_from_s3(s3_key: str, file_id: str) -> str:
     """Download file from S3"""
     try:
         local_path = f"/tmp/{file_id}_s3"
-        auditus.s3_client.download_file(
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            auditus.executor,
+            auditus.s3_client.download_file,
             auditus.config.s3_bucket,
             s3_key,
             local_path
@@ -412,34 +453,56 @@ async def _download_from_url(url: str, file_id: str) -> str:
         logger.error(f"Error downloading from URL: {str(e)}")
         raise
 
+def _scan_keys(pattern: str) -> List[bytes]:
+    """Keys matching pattern, fetched incrementally with SCAN so Redis is never blocked by KEYS"""
+    return list(auditus.redis_client.scan_iter(match=pattern, count=1000))
+
+def _delete_keys(pattern: str) -> List[bytes]:
+    """Delete the keys matching pattern in bounded chunks, returning them"""
+    keys = _scan_keys(pattern)
+    for start in range(0, len(keys), 1000):
+        auditus.redis_client.delete(*keys[start:start + 1000])
+    return keys
+
+def _capacity_exhausted() -> HTTPException:
+    """503 telling the client when to retry a request rejected for lack of analysis capacity"""
+    return HTTPException(status_code=503, detail="Analysis capacity exhausted, retry later", headers={"Retry-After": "5"})
+
 async def _cleanup_temp_file(file_path: str):
     """Clean up temporary file"""
-    try:
+    def remove():
         if os.path.exists(file_path):
             os.remove(file_path)
+    
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(auditus.executor, remove)
     except Exception as e:
         logger.error(f"Error cleaning up temp file {file_path}: {str(e)}")
 
-async def _process_single_analysis(request: AnalysisRequest) -> AnalysisResponse:
-    """Process single analysis request"""
+async def _process_single_analysis(request: AnalysisRequest, admission: AnalysisAdmission) -> AnalysisResponse:
+    """Process single analysis request using a slot claimed by the caller"""
     try:
         # Determine audio file path
         audio_path = None
-        if request.local_path:
-            audio_path = request.local_path
-        elif request.s3_key:
-            audio_path = await _download_from_s3(request.s3_key, request.file_id)
-        elif request.audio_url:
-            audio_path = await _download_from_url(request.audio_url, request.file_id)
-        else:
-            raise ValueError("Must provide audio_url, s3_key, or local_path")
-        
-        # Analyze music
-        features = await auditus.analyze_music(audio_path, request.file_id)
-        
-        # Cleanup
-        if request.s3_key or request.audio_url:
-            await _cleanup_temp_file(audio_path)
+        try:
+            if request.local_path:
+                audio_path = request.local_path
+            elif request.s3_key:
+                audio_path = await _download_from_s3(request.s3_key, request.file_id)
+            elif request.audio_url:
+                audio_path = await _download_from_url(request.audio_url, request.file_id)
+            else:
+                raise ValueError("Must provide audio_url, s3_key, or local_path")
+            
+            # Analyze music
+            features = await auditus.analyze_music(audio_path, request.file_id, admission)
+        finally:
+            admission.release()
+            
+            # Cleanup
+            if audio_path and (request.s3_key or request.audio_url):
+                await _cleanup_temp_file(audio_path)
         
         return AnalysisResponse(
             file_id=request.file_id,
@@ -534,6 +597,13 @@ async def shutdown_event():
     """Application shutdown event"""
     logger.info("Auditus Intelligence API shutting down...")
     
+    # Let running analyses finish, drop queued ones
+    auditus.analysis_pool.shutdown(wait=True, cancel_futures=True)
+    auditus.executor.shutdown(wait=False)
+    auditus.classifier_batcher.close()
+    auditus.embedding_batcher.close()
+    auditus.inference_executor.shutdown(wait=False)
+    
     # Cleanup connections
     try:
         auditus.redis_client.close()
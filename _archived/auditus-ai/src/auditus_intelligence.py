@@ -1,7 +1,7 @@
 import os
 import asyncio
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from pathlib import Path
 import numpy as np
 import torch
@@ -22,7 +22,9 @@ import aiofiles
 from datetime import datetime, timedelta
 import hashlib
 import pickle
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import joblib
 
 # Configure logging
@@ -36,8 +38,15 @@ class AuditusConfig(BaseModel):
     redis_url: str = "redis://localhost:6379"
     s3_bucket: str = "audiostems-ai-models"
     api_endpoint: str = "http://localhost:8000"
-    max_workers: int = 4
-    batch_size: int = 32
+    max_workers: int = 4  # I/O threads for Redis and S3
+    analysis_workers: Optional[int] = None  # analysis processes, defaults to the CPU count
+    analysis_queue_size: int = 8  # analyses allowed to wait for a free process before new ones are rejected
+    analysis_timeout: float = 300.0  # seconds per analysis request
+    batch_size: int = 32  # classifier rows per forward pass
+    batch_max_delay: float = 0.005  # seconds a partial batch waits for more rows
+    embedding_window_frames: int = 128  # mel frames per CNN window, about 3 s at hop 512
+    embedding_batch_size: int = 8  # CNN windows per forward pass; larger batches stop paying off on CPU
+    inference_threads: Optional[int] = None  # torch intra-op threads in this process, defaults to torch's choice
     feature_dim: int = 512
     num_classes: int = 1000
     device: str = "cuda" if torch.cuda.is_available() else "cpu"
@@ -77,6 +86,276 @@ class MusicRecommendation(BaseModel):
     bpm_match: bool
     key_compatibility: float
 
+class AnalysisQueueFull(Exception):
+    """Every analysis process is busy and the wait queue is full"""
+
+class AnalysisAdmission:
+    """An analysis slot claimed before the audio is fetched, handed to the pool when the analysis is submitted"""
+    
+    def __init__(self, intelligence: "AuditusIntelligence"):
+        self.intelligence = intelligence
+        self.held = True
+    
+    def release(self):
+        """Give the slot back; only the first call counts"""
+        if self.held:
+            self.held = False
+            self.intelligence.analyses_admitted -= 1
+
+class FeatureContext:
+    """Lazily computed features of one track; each is computed at most once and shared by every metric"""
+    
+    # Frame layout of the shared STFT (librosa's defaults, so S= features match their y= forms)
+    n_fft = 2048
+    hop_length = 512
+    block_frames = 2048  # frames per block for frame-local work, bounding temporary arrays
+    chroma_bins_per_octave = 36  # chroma_cqt's CQT resolution, which the tuning estimate must use too
+    
+    def __init__(self, y: Optional[np.ndarray], sr: int, values: Optional[Dict[str, Any]] = None):
+        self.y = y
+        self.sr = sr
+        self.values: Dict[str, Any] = dict(values or {})
+        self.computing: set = set()
+    
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.values:
+            compute = getattr(self, f"_compute_{name}", None)
+            if compute is None:
+                raise KeyError(f"Unknown feature: {name}")
+            if name in self.computing:
+                raise ValueError(f"Feature {name} depends on itself")
+            
+            # Features pull their inputs through ctx[...], so the graph resolves depth-first
+            self.computing.add(name)
+            try:
+                self.values[name] = compute()
+            finally:
+                self.computing.discard(name)
+        
+        return self.values[name]
+    
+    def _frame_blocks(self):
+        """(frame slice, samples) pairs covering the centered frames of y, block_frames at a time"""
+        # Same zero padding as center=True, so each block matches the matching columns of a full-signal call
+        padded = np.pad(self.y.astype(np.float32, copy=False), self.n_fft // 2)
+        frames = 1 + (len(padded) - self.n_fft) // self.hop_length
+        
+        for start in range(0, frames, self.block_frames):
+            stop = min(frames, start + self.block_frames)
+            yield slice(start, stop), padded[start * self.hop_length:(stop - 1) * self.hop_length + self.n_fft]
+    
+    def _by_blocks(self, descriptor: Callable[[np.ndarray, slice], np.ndarray]) -> np.ndarray:
+        """Apply a frame-local S= descriptor to column blocks of the shared STFT and join the results"""
+        magnitude = self["magnitude"]
+        blocks = [
+            slice(start, start + self.block_frames)
+            for start in range(0, magnitude.shape[-1], self.block_frames)
+        ]
+        return np.concatenate([descriptor(magnitude[:, block], block) for block in blocks], axis=-1)
+    
+    def _compute_magnitude(self) -> np.ndarray:
+        """Float32 magnitude STFT shared by every spectral feature"""
+        blocks = list(self._frame_blocks())
+        magnitude = np.empty((1 + self.n_fft // 2, blocks[-1][0].stop), dtype=np.float32)
+        
+        # Only one block's complex STFT is alive at a time
+        for frames, samples in blocks:
+            magnitude[:, frames] = np.abs(
+                librosa.stft(samples, n_fft=self.n_fft, hop_length=self.hop_length, center=False)
+            )
+        return magnitude
+    
+    def _compute_mel_power(self) -> np.ndarray:
+        """Mel power spectrogram projected from the shared STFT"""
+        return self._by_blocks(lambda S, _: librosa.feature.melspectrogram(S=S ** 2, sr=self.sr))
+    
+    def _compute_mel_log(self) -> np.ndarray:
+        """Mel spectrogram in dB re 1.0, the input of MFCC and onset strength"""
+        return librosa.power_to_db(self["mel_power"])
+    
+    def _compute_onset_envelope(self) -> np.ndarray:
+        """Onset strength as beat_track computes it internally"""
+        return librosa.onset.onset_strength(
+            S=self["mel_log"], sr=self.sr, hop_length=self.hop_length, aggregate=np.median
+        )
+    
+    def _compute_beats(self) -> Tuple[float, np.ndarray]:
+        """Tempo and beat frames"""
+        return librosa.beat.beat_track(onset_envelope=self["onset_envelope"], sr=self.sr, hop_length=self.hop_length)
+    
+    def _compute_tempo(self) -> float:
+        """Estimated tempo in BPM"""
+        return self["beats"][0]
+    
+    def _compute_tuning(self) -> float:
+        """Tuning offset in fractions of a CQT bin, as chroma_cqt's own estimate_tuning call computes it"""
+        # piptrack is frame-local, so only its voiced peaks need to outlive each block
+        pitches, magnitudes = [], []
+        for start in range(0, self["magnitude"].shape[-1], self.block_frames):
+            block = self["magnitude"][:, start:start + self.block_frames]
+            pitch, magnitude = librosa.piptrack(S=block, sr=self.sr, n_fft=self.n_fft)
+            voiced = pitch > 0
+            pitches.append(pitch[voiced])
+            magnitudes.append(magnitude[voiced])
+        
+        pitches, magnitudes = np.concatenate(pitches), np.concatenate(magnitudes)
+        threshold = np.median(magnitudes) if len(magnitudes) else 0.0
+        return librosa.pitch_tuning(pitches[magnitudes >= threshold], bins_per_octave=self.chroma_bins_per_octave)
+    
+    def _compute_chroma(self) -> np.ndarray:
+        """Constant-Q chromagram"""
+        # chroma_cqt would otherwise run its own STFT for the tuning estimate
+        return librosa.feature.chroma_cqt(
+            y=self.y, sr=self.sr, tuning=self["tuning"], bins_per_octave=self.chroma_bins_per_octave
+        )
+    
+    def _compute_mfcc(self) -> np.ndarray:
+        """20 MFCCs"""
+        return librosa.feature.mfcc(S=self["mel_log"], n_mfcc=20)
+    
+    def _compute_mfcc_13(self) -> np.ndarray:
+        """First 13 MFCCs; the orthonormal DCT makes these identical to n_mfcc=13"""
+        return self["mfcc"][:13]
+    
+    def _compute_mel_db(self) -> np.ndarray:
+        """Mel spectrogram in dB relative to its peak"""
+        return librosa.power_to_db(self["mel_power"], ref=np.max)
+    
+    def _compute_spectral_centroid(self) -> np.ndarray:
+        """Spectral centroid per frame, shape (1, frames)"""
+        return self._by_blocks(lambda S, _: librosa.feature.spectral_centroid(S=S, sr=self.sr))
+    
+    def _compute_spectral_rolloff(self) -> np.ndarray:
+        """Spectral rolloff per frame, shape (1, frames)"""
+        return self._by_blocks(lambda S, _: librosa.feature.spectral_rolloff(S=S, sr=self.sr))
+    
+    def _compute_spectral_bandwidth(self) -> np.ndarray:
+        """Spectral bandwidth per frame, shape (1, frames)"""
+        centroid = self["spectral_centroid"]
+        return self._by_blocks(lambda S, block: librosa.feature.spectral_bandwidth(
+            S=S, sr=self.sr, centroid=centroid[:, block]
+        ))
+    
+    def _compute_duration(self) -> float:
+        """Length in seconds"""
+        return len(self.y) / self.sr
+    
+    def _compute_rms(self) -> np.ndarray:
+        """RMS energy per frame, shape (1, frames)"""
+        # Time-domain frames are cheaper than the STFT route and keep the unwindowed scale
+        return np.concatenate([
+            librosa.feature.rms(y=samples, frame_length=self.n_fft, hop_length=self.hop_length, center=False)
+            for _, samples in self._frame_blocks()
+        ], axis=-1)
+
+# Features the metrics read; intermediates such as the STFT stay in the worker process
+ANALYSIS_FEATURES = (
+    "beats", "chroma", "mfcc", "mel_db", "rms", "duration",
+    "spectral_centroid", "spectral_rolloff", "spectral_bandwidth"
+)
+
+def extract_features(audio_path: str, sr: int = 22050) -> Dict[str, Any]:
+    """Load a track and compute ANALYSIS_FEATURES; runs in an analysis worker process"""
+    y, sr = librosa.load(audio_path, sr=sr)
+    ctx = FeatureContext(y, sr)
+    return {"sr": sr, "values": {name: ctx[name] for name in ANALYSIS_FEATURES}}
+
+def mel_windows(mel_db: np.ndarray, window_frames: int) -> np.ndarray:
+    """Split a dB mel spectrogram into (windows, 1, n_mels, window_frames) CNN inputs scaled to [0, 1]"""
+    n_mels, frames = mel_db.shape
+    count = max(1, -(-frames // window_frames))
+    
+    # The last window is padded with silence at the -80 dB floor of power_to_db
+    padded = np.full((n_mels, count * window_frames), -80.0, dtype=np.float32)
+    padded[:, :frames] = mel_db
+    windows = padded.reshape(n_mels, count, window_frames).transpose(1, 0, 2)
+    return ((windows + 80.0) / 80.0)[:, None]
+
+# Labels of the classifier's genre and mood heads
+GENRES = ['electronic', 'rock', 'pop', 'jazz', 'classical', 'hip-hop']
+MOODS = ['energetic', 'calm', 'happy', 'sad', 'aggressive', 'peaceful']
+
+class InferenceBatcher:
+    """Micro-batches single-row model calls from concurrent analyses into one forward pass"""
+    
+    def __init__(self, model: nn.Module, device: str, executor: ThreadPoolExecutor,
+                 batch_size: int = 32, max_delay: float = 0.005):
+        self.model = model
+        self.device = device
+        self.executor = executor
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        
+        # Rows waiting for the next batch as (row, future, enqueued_at)
+        self.pending: List[Tuple[np.ndarray, asyncio.Future, float]] = []
+        self.arrived = asyncio.Event()
+        self.full = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+    
+    async def infer(self, row: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Model outputs for one input row, computed as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        if self.worker is None or self.worker.done() or self.worker.get_loop() is not loop:
+            # Batch state belongs to one running worker; a new loop (e.g. another asyncio.run) or close() starts afresh
+            self.pending = []
+            self.arrived = asyncio.Event()
+            self.full = asyncio.Event()
+            self.worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self.pending.append((row, future, loop.time()))
+        self.arrived.set()
+        if len(self.pending) >= self.batch_size:
+            self.full.set()
+        return await future
+    
+    async def _run(self):
+        """Send a batch once it is full or its oldest row has waited max_delay"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.arrived.wait()
+            try:
+                timeout = self.pending[0][2] + self.max_delay - loop.time()
+                await asyncio.wait_for(self.full.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            if len(self.pending) < self.batch_size:
+                self.full.clear()
+            if not self.pending:
+                self.arrived.clear()
+            
+            # Rows whose caller gave up are dropped before the forward pass
+            batch = [(row, future) for row, future, _ in batch if not future.done()]
+            if not batch:
+                continue
+            
+            rows, futures = zip(*batch)
+            try:
+                outputs = await loop.run_in_executor(self.executor, self._forward, np.stack(rows))
+                for i, future in enumerate(futures):
+                    if not future.done():
+                        future.set_result(tuple(output[i] for output in outputs))
+            except Exception as e:
+                logger.error(f"Error running batched inference: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _forward(self, rows: np.ndarray) -> List[np.ndarray]:
+        """One forward pass over a stacked batch, without autograd bookkeeping"""
+        with torch.inference_mode():
+            outputs = self.model(torch.from_numpy(rows).float().to(self.device))
+            if isinstance(outputs, torch.Tensor):
+                outputs = (outputs,)
+            return [output.cpu().numpy() for output in outputs]
+    
+    def close(self):
+        """Stop batching; the executor belongs to the caller"""
+        if self.worker is not None:
+            self.worker.cancel()
+
 class AuditusIntelligence:
     """Main Auditus Intelligence AI service"""
     
@@ -86,14 +365,47 @@ class AuditusIntelligence:
         self.s3_client = boto3.client('s3')
         self.executor = ThreadPoolExecutor(max_workers=config.max_workers)
         
+        # librosa and torch work runs in separate processes so the event loop stays free.
+        # Spawned workers avoid inheriting torch and thread state from this process
+        self.analysis_workers = config.analysis_workers or os.cpu_count() or 1
+        self.analysis_pool = self._create_analysis_pool()
+        self.analysis_capacity = self.analysis_workers + config.analysis_queue_size
+        self.analyses_in_flight = 0
+        self.analyses_admitted = 0  # claimed by requests still fetching their audio
+        
         # Initialize models
         self.feature_extractor = None
         self.classifier = None
         self.recommendation_model = None
         
+        # Bound torch's intra-op threads so inference does not oversubscribe the cores analysis workers use
+        if config.inference_threads:
+            torch.set_num_threads(config.inference_threads)
+        
         # Load models
         self._load_models()
         
+        # Both batchers run forward passes on one thread, so batches never compete for torch's intra-op threads
+        self.inference_executor = ThreadPoolExecutor(max_workers=1)
+        
+        # Genre and mood requests from concurrent analyses share forward passes
+        self.classifier_batcher = InferenceBatcher(
+            self.classifier,
+            config.device,
+            self.inference_executor,
+            batch_size=config.batch_size,
+            max_delay=config.batch_max_delay
+        )
+        
+        # Mel windows from every track in flight are embedded in shared batches
+        self.embedding_batcher = InferenceBatcher(
+            self.feature_extractor,
+            config.device,
+            self.inference_executor,
+            batch_size=config.embedding_batch_size,
+            max_delay=config.batch_max_delay
+        )
+        
         # Initialize feature cache
         self.feature_cache = {}
         
@@ -144,19 +456,21 @@ class AuditusIntelligence:
                 x = self.fc2(x)
                 return x
         
-        model = FeatureExtractor()
+        model = FeatureExtractor(output_dim=self.config.feature_dim)
         model.to(self.config.device)
         model.eval()
         return model
     
     def _load_classifier(self):
         """Load music classification model"""
+        # Shared trunk with one head per task, so genre and mood come from a single forward pass
         class MusicClassifier(nn.Module):
-            def __init__(self, input_dim=512, hidden_dim=256, num_classes=1000):
+            def __init__(self, input_dim=512, hidden_dim=256, num_genres=len(GENRES), num_moods=len(MOODS)):
                 super().__init__()
                 self.fc1 = nn.Linear(input_dim, hidden_dim)
                 self.fc2 = nn.Linear(hidden_dim, hidden_dim // 2)
-                self.fc3 = nn.Linear(hidden_dim // 2, num_classes)
+                self.genre_head = nn.Linear(hidden_dim // 2, num_genres)
+                self.mood_head = nn.Linear(hidden_dim // 2, num_moods)
                 self.dropout = nn.Dropout(0.3)
                 
             def forward(self, x):
@@ -164,10 +478,9 @@ class AuditusIntelligence:
                 x = self.dropout(x)
                 x = F.relu(self.fc2(x))
                 x = self.dropout(x)
-                x = self.fc3(x)
-                return x
+                return self.genre_head(x), self.mood_head(x)
         
-        model = MusicClassifier()
+        model = MusicClassifier(input_dim=self.config.feature_dim)
         model.to(self.config.device)
         model.eval()
         return model
@@ -178,7 +491,15 @@ class AuditusIntelligence:
         # In production, use more sophisticated recommendation systems
         return None
     
-    async def analyze_music(self, audio_path: str, file_id: str) -> MusicFeatures:
+    def admit_analysis(self) -> AnalysisAdmission:
+        """Claim an analysis slot before downloading, so a saturated service rejects work before fetching it"""
+        if self.analyses_in_flight + self.analyses_admitted >= self.analysis_capacity:
+            raise AnalysisQueueFull(f"{self.analyses_in_flight} analyses running or queued, {self.analyses_admitted} fetching audio")
+        self.analyses_admitted += 1
+        return AnalysisAdmission(self)
+    
+    async def analyze_music(self, audio_path: str, file_id: str,
+                            admission: Optional[AnalysisAdmission] = None) -> MusicFeatures:
         """Analyze music and extract features"""
         try:
             logger.info(f"Analyzing music file: {file_id}")
@@ -188,40 +509,35 @@ class AuditusIntelligence:
             if cached_features:
                 return cached_features
             
-            # Load audio
-            y, sr = librosa.load(audio_path, sr=22050)
-            
-            # Extract basic features
-            tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-            chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+            # Decode and compute the heavy features in the analysis pool
+            ctx = await self._extract_features(audio_path, admission)
+            tempo = ctx["tempo"]
             
             # Extract advanced features
-            features = await self._extract_advanced_features(y, sr)
+            features = await self._extract_advanced_features(ctx)
+            
+            # Create features vector for ML models
+            features_vector = await self._create_features_vector(features)
             
             # Classify genre and mood
-            genre, mood = await self._classify_genre_mood(features['mfcc'])
+            genre, mood = await self._classify_genre_mood(features_vector)
             
             # Detect instruments
             instruments = await self._detect_instruments(features['spectral'])
             
             # Calculate musical features
-            key, mode, key_confidence = await self._detect_key_mode(chroma)
-            energy = np.mean(librosa.feature.rms(y=y))
-            loudness = np.mean(librosa.feature.rms(y=y))
+            key, mode, key_confidence = await self._detect_key_mode(ctx["chroma"])
+            energy = np.mean(ctx["rms"])
+            loudness = np.mean(ctx["rms"])
             
             # Calculate advanced metrics
-            danceability = await self._calculate_danceability(y, sr, tempo)
-            valence = await self._calculate_valence(y, sr)
-            acousticness = await self._calculate_acousticness(y, sr)
-            instrumentalness = await self._calculate_instrumentalness(y, sr)
-            speechiness = await self._calculate_speechiness(y, sr)
-            liveness = await self._calculate_liveness(y, sr)
-            complexity = await self._calculate_complexity(y, sr)
-            
-            # Create features vector for ML models
-            features_vector = await self._create_features_vector(features)
+            danceability = await self._calculate_danceability(ctx, tempo)
+            valence = await self._calculate_valence(ctx)
+            acousticness = await self._calculate_acousticness(ctx)
+            instrumentalness = await self._calculate_instrumentalness(ctx)
+            speechiness = await self._calculate_speechiness(ctx)
+            liveness = await self._calculate_liveness(ctx)
+            complexity = await self._calculate_complexity(ctx)
             
             # Create MusicFeatures object
             music_features = MusicFeatures(
@@ -256,47 +572,76 @@ class AuditusIntelligence:
             logger.error(f"Error analyzing music {file_id}: {str(e)}")
             raise
     
-    async def _extract_advanced_features(self, y: np.ndarray, sr: int) -> Dict[str, np.ndarray]:
+    async def _extract_features(self, audio_path: str, admission: Optional[AnalysisAdmission] = None) -> FeatureContext:
+        """Run extract_features in the analysis pool, rejecting work beyond the queue bound"""
+        # A slot claimed before the download becomes this analysis's in-flight slot
+        if admission is not None:
+            admission.release()
+        if self.analyses_in_flight + self.analyses_admitted >= self.analysis_capacity:
+            raise AnalysisQueueFull(f"{self.analyses_in_flight} analyses already running or queued")
+        
+        try:
+            future = self.analysis_pool.submit(extract_features, audio_path)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed), which breaks the whole pool; replace it and retry once
+            logger.warning("Analysis pool is broken, recreating it")
+            self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+            self.analysis_pool = self._create_analysis_pool()
+            future = self.analysis_pool.submit(extract_features, audio_path)
+        
+        # The slot is held until the worker finishes, even if the caller has stopped waiting
+        self.analyses_in_flight += 1
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_analysis_slot))
+        
+        # On timeout the wrapped future is cancelled, which also drops the job if it has not started
+        result = await asyncio.wait_for(asyncio.wrap_future(future), self.config.analysis_timeout)
+        return FeatureContext(None, result["sr"], result["values"])
+    
+    def _create_analysis_pool(self) -> ProcessPoolExecutor:
+        """Process pool for extract_features"""
+        return ProcessPoolExecutor(
+            max_workers=self.analysis_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    def _release_analysis_slot(self):
+        """Free an analysis slot once its worker is done"""
+        self.analyses_in_flight -= 1
+    
+    async def _extract_advanced_features(self, ctx: FeatureContext) -> Dict[str, np.ndarray]:
         """Extract advanced audio features"""
         features = {}
         
         # MFCC features
-        features['mfcc'] = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+        features['mfcc'] = ctx["mfcc"]
         
         # Spectral features
-        features['spectral'] = librosa.feature.spectral_centroid(y=y, sr=sr)
+        features['spectral'] = ctx["spectral_centroid"]
         
         # Mel spectrogram
-        mel_spec = librosa.feature.melspectrogram(y=y, sr=sr)
-        features['mel'] = librosa.power_to_db(mel_spec, ref=np.max)
+        features['mel'] = ctx["mel_db"]
         
         # Chroma features
-        features['chroma'] = librosa.feature.chroma_cqt(y=y, sr=sr)
+        features['chroma'] = ctx["chroma"]
         
         # Rhythm features
-        features['tempo'] = librosa.beat.beat_track(y=y, sr=sr)[0]
+        features['tempo'] = ctx["tempo"]
         
         return features
     
-    async def _classify_genre_mood(self, mfcc: np.ndarray) -> Tuple[List[str], List[str]]:
+    async def _classify_genre_mood(self, features_vector: List[float]) -> Tuple[List[str], List[str]]:
         """Classify genre and mood using ML models"""
         try:
             # Simplified classification
             # In production, use trained models for genre and mood classification
+            genre_logits, mood_logits = await self.classifier_batcher.infer(
+                np.asarray(features_vector, dtype=np.float32)
+            )
             
-            # Genre classification (simplified)
-            genres = ['electronic', 'rock', 'pop', 'jazz', 'classical', 'hip-hop']
-            genre_probs = self.classifier(torch.tensor(mfcc.mean(axis=1), dtype=torch.float32).unsqueeze(0))
-            genre_probs = F.softmax(genre_probs, dim=1)
-            top_genres = torch.topk(genre_probs, 3)[1][0].tolist()
-            predicted_genres = [genres[i] for i in top_genres]
-            
-            # Mood classification (simplified)
-            moods = ['energetic', 'calm', 'happy', 'sad', 'aggressive', 'peaceful']
-            mood_probs = self.classifier(torch.tensor(mfcc.mean(axis=1), dtype=torch.float32).unsqueeze(0))
-            mood_probs = F.softmax(mood_probs, dim=1)
-            top_moods = torch.topk(mood_probs, 3)[1][0].tolist()
-            predicted_moods = [moods[i] for i in top_moods]
+            # Top 3 of each head; softmax preserves the order so logits rank the same
+            predicted_genres = [GENRES[i] for i in np.argsort(genre_logits)[::-1][:3]]
+            predicted_moods = [MOODS[i] for i in np.argsort(mood_logits)[::-1][:3]]
             
             return predicted_genres, predicted_moods
             
@@ -357,15 +702,15 @@ class AuditusIntelligence:
             logger.error(f"Error in key detection: {str(e)}")
             return 'C', 'major', 0.5
     
-    async def _calculate_danceability(self, y: np.ndarray, sr: int, tempo: float) -> float:
+    async def _calculate_danceability(self, ctx: FeatureContext, tempo: float) -> float:
         """Calculate danceability score"""
         try:
             # Simplified danceability calculation
             # In production, use more sophisticated algorithms
             
             # Factors: tempo, rhythm strength, beat consistency
-            rhythm_strength = np.mean(librosa.feature.rms(y=y))
-            beat_consistency = librosa.beat.beat_track(y=y, sr=sr)[1]
+            rhythm_strength = np.mean(ctx["rms"])
+            beat_consistency = ctx["beats"][1]
             
             # Normalize tempo (120 BPM is ideal for danceability)
             tempo_score = 1.0 - abs(tempo - 120) / 120
@@ -377,15 +722,15 @@ class AuditusIntelligence:
             logger.error(f"Error calculating danceability: {str(e)}")
             return 0.5
     
-    async def _calculate_valence(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_valence(self, ctx: FeatureContext) -> float:
         """Calculate valence (positivity) score"""
         try:
             # Simplified valence calculation
             # In production, use trained models for emotion detection
             
             # Use spectral features to estimate valence
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+            spectral_centroids = ctx["spectral_centroid"][0]
+            spectral_rolloff = ctx["spectral_rolloff"][0]
             
             # Higher frequencies and rolloff indicate more positive valence
             valence = (np.mean(spectral_centroids) + np.mean(spectral_rolloff)) / 2
@@ -397,15 +742,15 @@ class AuditusIntelligence:
             logger.error(f"Error calculating valence: {str(e)}")
             return 0.5
     
-    async def _calculate_acousticness(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_acousticness(self, ctx: FeatureContext) -> float:
         """Calculate acousticness score"""
         try:
             # Simplified acousticness calculation
             # In production, use more sophisticated acoustic vs electronic detection
             
             # Use spectral features to distinguish acoustic from electronic
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
+            spectral_centroids = ctx["spectral_centroid"][0]
+            spectral_bandwidth = ctx["spectral_bandwidth"][0]
             
             # Acoustic instruments typically have more complex spectral characteristics
             acousticness = np.mean(spectral_bandwidth) / np.mean(spectral_centroids)
@@ -417,14 +762,14 @@ class AuditusIntelligence:
             logger.error(f"Error calculating acousticness: {str(e)}")
             return 0.5
     
-    async def _calculate_instrumentalness(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_instrumentalness(self, ctx: FeatureContext) -> float:
         """Calculate instrumentalness score"""
         try:
             # Simplified instrumentalness calculation
             # In production, use voice activity detection models
             
             # Use spectral features to detect voice vs instruments
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+            mfcc = ctx["mfcc_13"]
             
             # Voice typically has specific MFCC patterns
             # This is a simplified heuristic
@@ -437,14 +782,14 @@ class AuditusIntelligence:
             logger.error(f"Error calculating instrumentalness: {str(e)}")
             return 0.7
     
-    async def _calculate_speechiness(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_speechiness(self, ctx: FeatureContext) -> float:
         """Calculate speechiness score"""
         try:
             # Simplified speechiness calculation
             # In production, use speech detection models
             
             # Use spectral features to detect speech-like characteristics
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+            spectral_centroids = ctx["spectral_centroid"][0]
             
             # Speech typically has lower spectral centroids
             speechiness = 1.0 - (np.mean(spectral_centroids) / np.max(spectral_centroids))
@@ -455,14 +800,14 @@ class AuditusIntelligence:
             logger.error(f"Error calculating speechiness: {str(e)}")
             return 0.1
     
-    async def _calculate_liveness(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_liveness(self, ctx: FeatureContext) -> float:
         """Calculate liveness score"""
         try:
             # Simplified liveness calculation
             # In production, use models trained on live vs studio recordings
             
             # Use spectral features to detect live characteristics
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+            spectral_rolloff = ctx["spectral_rolloff"][0]
             
             # Live recordings often have different spectral characteristics
             liveness = np.mean(spectral_rolloff) / np.max(spectral_rolloff)
@@ -473,21 +818,21 @@ class AuditusIntelligence:
             logger.error(f"Error calculating liveness: {str(e)}")
             return 0.3
     
-    async def _calculate_complexity(self, y: np.ndarray, sr: int) -> float:
+    async def _calculate_complexity(self, ctx: FeatureContext) -> float:
         """Calculate musical complexity score"""
         try:
             # Calculate various complexity metrics
             
             # Harmonic complexity
-            chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+            chroma = ctx["chroma"]
             harmonic_complexity = np.std(chroma)
             
             # Rhythmic complexity
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-            rhythmic_complexity = len(beats) / len(y) * sr
+            tempo, beats = ctx["beats"]
+            rhythmic_complexity = len(beats) / ctx["duration"]
             
             # Spectral complexity
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+            spectral_centroids = ctx["spectral_centroid"][0]
             spectral_complexity = np.std(spectral_centroids)
             
             # Combine complexity metrics
@@ -503,29 +848,12 @@ class AuditusIntelligence:
     async def _create_features_vector(self, features: Dict[str, np.ndarray]) -> List[float]:
         """Create feature vector for ML models"""
         try:
-            # Combine all features into a single vector
-            feature_vector = []
-            
-            # MFCC features
-            feature_vector.extend(np.mean(features['mfcc'], axis=1).tolist())
-            feature_vector.extend(np.std(features['mfcc'], axis=1).tolist())
-            
-            # Spectral features
-            feature_vector.extend([np.mean(features['spectral'])])
-            feature_vector.extend([np.std(features['spectral'])])
-            
-            # Mel features
-            feature_vector.extend([np.mean(features['mel'])])
-            feature_vector.extend([np.std(features['mel'])])
-            
-            # Pad or truncate to fixed length
-            target_length = self.config.feature_dim
-            if len(feature_vector) < target_length:
-                feature_vector.extend([0.0] * (target_length - len(feature_vector)))
-            else:
-                feature_vector = feature_vector[:target_length]
+            # Embed fixed-length mel windows with the CNN; the batcher splits them into batch_size chunks
+            windows = mel_windows(features['mel'], self.config.embedding_window_frames)
+            embeddings = await asyncio.gather(*[self.embedding_batcher.infer(window) for window in windows])
             
-            return feature_vector
+            # Mean-pool the window embeddings into one track vector
+            return np.mean([outputs[0] for outputs in embeddings], axis=0).tolist()
             
         except Exception as e:
             logger.error(f"Error creating feature vector: {str(e)}")
@@ -633,7 +961,8 @@ class AuditusIntelligence:
     async def _get_cached_features(self, file_id: str) -> Optional[MusicFeatures]:
         """Get cached features from Redis"""
         try:
-            cached_data = self.redis_client.get(f"music_features:{file_id}")
+            loop = asyncio.get_running_loop()
+            cached_data = await loop.run_in_executor(self.executor, self.redis_client.get, f"music_features:{file_id}")
             if cached_data:
                 return MusicFeatures.parse_raw(cached_data)
             return None
@@ -644,7 +973,10 @@ class AuditusIntelligence:
     async def _cache_features(self, file_id: str, features: MusicFeatures):
         """Cache features in Redis"""
         try:
-            self.redis_client.setex(
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor,
+                self.redis_client.setex,
                 f"music_features:{file_id}",
                 3600,  # 1 hour TTL
                 features.json()
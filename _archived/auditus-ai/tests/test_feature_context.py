@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+import numpy as np
+import librosa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from auditus_intelligence import FeatureContext
+
+SR = 22050
+
+def detuned_chord(cents: float, seconds: float = 5.0) -> np.ndarray:
+    """A minor triad with harmonics, shifted off A440 by cents"""
+    t = np.arange(int(seconds * SR)) / SR
+    shift = 2 ** (cents / 1200)
+    y = np.zeros_like(t)
+    for midi in (57, 60, 64):
+        f0 = librosa.midi_to_hz(midi) * shift
+        for harmonic in range(1, 5):
+            y += np.sin(2 * np.pi * f0 * harmonic * t) / harmonic
+    return (0.2 * y).astype(np.float32)
+
+def test_tuning_matches_chroma_cqt_estimate():
+    y = detuned_chord(30)
+    ctx = FeatureContext(y, SR)
+    
+    expected = librosa.estimate_tuning(y=y, sr=SR, bins_per_octave=36)
+    assert np.isclose(ctx["tuning"], expected)
+
+def test_chroma_matches_chroma_cqt_on_detuned_signal():
+    y = detuned_chord(30)
+    ctx = FeatureContext(y, SR)
+    
+    expected = librosa.feature.chroma_cqt(y=y, sr=SR)
+    np.testing.assert_allclose(ctx["chroma"], expected, atol=1e-5)
+
+def test_shared_stft_is_computed_once(monkeypatch):
+    calls = []
+    compute = FeatureContext._compute_magnitude
+    
+    def counting(self):
+        calls.append(1)
+        return compute(self)
+    
+    monkeypatch.setattr(FeatureContext, "_compute_magnitude", counting)
+    ctx = FeatureContext(detuned_chord(0, seconds=2.0), SR)
+    
+    # Every spectral feature reads the one magnitude STFT
+    for name in ("mel_power", "mfcc", "mel_db", "spectral_centroid", "spectral_rolloff", "spectral_bandwidth", "tuning", "rms"):
+        ctx[name]
+    assert ctx["mfcc"] is ctx["mfcc"]
+    assert len(calls) == 1
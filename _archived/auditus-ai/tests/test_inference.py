@@ -0,0 +1,98 @@
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from auditus_intelligence import InferenceBatcher, mel_windows
+
+class RecordingModel(nn.Module):
+    """Doubles its input and records the batch size of every forward pass"""
+    
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.batches = []
+        self.fail = fail
+    
+    def forward(self, x):
+        self.batches.append(len(x))
+        if self.fail:
+            raise ValueError("forward failed")
+        return x * 2, x.sum(dim=1)
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown()
+
+def test_concurrent_calls_share_one_forward_pass(executor):
+    model = RecordingModel()
+    batcher = InferenceBatcher(model, "cpu", executor, batch_size=8, max_delay=1.0)
+    rows = [np.full(3, i, dtype=np.float32) for i in range(8)]
+    
+    async def run():
+        results = await asyncio.gather(*[batcher.infer(row) for row in rows])
+        batcher.close()
+        return results
+    
+    results = asyncio.run(run())
+    
+    # A full batch goes out at once instead of waiting out max_delay
+    assert model.batches == [8]
+    for row, (doubled, total) in zip(rows, results):
+        np.testing.assert_allclose(doubled, row * 2)
+        assert total == pytest.approx(row.sum())
+
+def test_forward_errors_reach_every_caller_in_the_batch(executor):
+    model = RecordingModel(fail=True)
+    batcher = InferenceBatcher(model, "cpu", executor, batch_size=4, max_delay=0.01)
+    
+    async def run():
+        results = await asyncio.gather(
+            *[batcher.infer(np.zeros(3, dtype=np.float32)) for _ in range(3)], return_exceptions=True
+        )
+        
+        # The worker survives a failed batch
+        model.fail = False
+        after = await batcher.infer(np.ones(3, dtype=np.float32))
+        batcher.close()
+        return results, after
+    
+    results, after = asyncio.run(run())
+    
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+    np.testing.assert_allclose(after[0], np.full(3, 2.0))
+
+def test_infer_after_close_restarts_the_worker(executor):
+    batcher = InferenceBatcher(RecordingModel(), "cpu", executor, batch_size=2, max_delay=0.01)
+    
+    async def run():
+        await batcher.infer(np.ones(3, dtype=np.float32))
+        batcher.close()
+        await asyncio.sleep(0)
+        result = await asyncio.wait_for(batcher.infer(np.ones(3, dtype=np.float32)), 5)
+        batcher.close()
+        return result
+    
+    np.testing.assert_allclose(asyncio.run(run())[0], np.full(3, 2.0))
+
+@pytest.mark.parametrize("frames, count", [(256, 2), (300, 3), (10, 1)])
+def test_mel_windows_shape_and_padding(frames, count):
+    mel_db = np.linspace(-80.0, 0.0, 128 * frames, dtype=np.float32).reshape(128, frames)
+    
+    windows = mel_windows(mel_db, 128)
+    
+    assert windows.shape == (count, 1, 128, 128)
+    assert windows.dtype == np.float32
+    
+    # Windows tile the spectrogram in order, scaled to [0, 1]; the tail is padded with silence
+    joined = np.concatenate(list(windows[:, 0]), axis=1)
+    np.testing.assert_allclose(joined[:, :frames], (mel_db + 80.0) / 80.0, atol=1e-6)
+    assert not joined[:, frames:].any()